@@ -0,0 +1,21 @@
+# 2-pass assembler package
+#
+#	assembler - tokenizer, pass 1, pass 2 and the MIF writer
+#	isa		  - instruction set tables
+#	symbols	  - the label symbol table
+#	synth	  - instruction sequences for 16-bit constants
+#	linker	  - object files and the linker
+#	parallel  - pass 2 on a pool of worker processes
+#	simulator - instruction set simulator
+#	profiler  - execution profiler for the simulator
+#	trace	  - binary execution traces of the simulator
+#	batch	  - batch simulation over many input vectors
+#	cfg		  - control-flow graph, call graph and stack depth
+#	wcet	  - worst-case execution time estimator
+#	dataflow  - register usage, liveness and live ranges
+#	mifcheck  - word by word comparison of MIF images
+#	bench	  - benchmarks on synthetic programs
+#	fuzz	  - differential fuzz harness for the encoder
+#
+# Nothing is imported here, so a program only pays for the modules it uses.
+#
@@ -0,0 +1,628 @@
+# Template by Bruce A. Maxwell, 2015
+#
+# implements a simple assembler for the following assembly language
+# 
+# - One instruction or label per line.
+#
+# - Blank lines are ignored.
+#
+# - Comments start with a # as the first character and all subsequent
+# - characters on the line are ignored.
+#
+# - Spaces delimit instruction elements.
+#
+# - A label ends with a colon and must be a single symbol on its own line.
+#
+# - A label can be any single continuous sequence of printable
+# - characters; a colon or space terminates the symbol.  A label used in
+# - an immediate or address value must not contain + or - and must not
+# - start with a digit or a quote, since those are read as part of the
+# - value; branch targets may be any label.
+#
+# - Immediate and address values are given in decimal, in hex with a 0x
+# - prefix, in binary with a 0b prefix or as a character in single quotes
+# - ('a', '\n').  A value may also be a sum of such terms and one label,
+# - e.g. table+2 or 'a'-1.  Values are parsed once, when the source is
+# - tokenized.
+#
+# - A decimal number of more than one digit cannot start with 0, so an
+# - address written in binary without the 0b prefix, like 00000011, is
+# - an error rather than decimal 11.
+#
+# - Address values must be positive
+#
+# - Negative immediate values must have a preceeding '-' with no space
+# - between it and the number.
+#
+# - A line starting with a '.' is a directive; directives do not take up
+# - a program location (see linker.py for .global and .extern).
+#
+# - .data switches to the data section and .text back to the program.
+# - Labels in the data section name data memory addresses, which are
+# - laid out from 0 by the data directives:
+#
+#	.word V ...	  - one word for each value V
+#	.fill N V	  - N words holding the value V
+#	.space N	  - N words holding 0
+#
+# - Word values are 16 bits, signed or unsigned, and may refer to labels.
+# - The data image is written to a second MIF file next to the program.
+#
+# - A line holding only END ends the program.
+#
+
+# Language definition:
+#
+# LOAD D A	 - load from address A to destination D
+# LOADA D A	 - load using the address register from address A + RE to destination D
+# STORE S A	 - store value in S to address A
+# STOREA S A - store using the address register the value in S to address A + RE
+# BRA L		 - branch to label A
+# BRAZ L	 - branch to label A if the CR zero flag is set
+# BRAN L	 - branch to label L if the CR negative flag is set
+# BRAO L	 - branch to label L if the CR overflow flag is set
+# BRAC L	 - branch to label L if the CR carry flag is set
+# CALL L	 - call the routine at label L
+# RETURN	 - return from a routine
+# HALT		 - execute the halt/exit instruction
+# PUSH S	 - push source value S to the stack
+# POP D		 - pop form the stack and put in destination D
+# OPORT S	 - output to the global port from source S
+# IPORT D	 - input from the global port to destination D
+# ADD A B C	 - execute C <= A + B
+# SUB A B C	 - execute C <= A - B
+# AND A B C	 - execute C <= A and B	 bitwise
+# OR  A B C	 - execute C <= A or B	 bitwise
+# XOR A B C	 - execute C <= A xor B	 bitwise
+# SHIFTL A C - execute C <= A shift left by 1
+# SHIFTR A C - execute C <= A shift right by 1
+# ROTL A C	 - execute C <= A rotate left by 1
+# ROTR A C	 - execute C <= A rotate right by 1
+# MOVE A C	 - execute C <= A where A is a source register
+# MOVEI V C	 - execute C <= value V
+# LI V C	 - execute C <= 16-bit value V, expanded into the shortest
+#			   MOVEI/shift/rotate/ALU sequence on C (see synth.py)
+#
+
+# 2-pass assembler
+# pass 1: read through the instructions and put numbers on each instruction location
+#		  calculate the label values
+#
+# pass 2: read through the instructions and build the machine instructions
+#
+
+import array
+import re
+import sys
+
+from . import isa
+from . import symbols
+from . import synth
+
+# the directives that lay out data memory
+DATA = ( ".word", ".fill", ".space" )
+
+
+# returns where an error is, given the source line number or, if that is
+# not known, the text of the instruction
+def where( linenum ):
+	if isinstance( linenum, int ):
+		return "on line %d" % (linenum)
+	return "in %s" % (linenum)
+
+
+# converts d to an 8-bit 2-s complement binary value
+def dec2comp8( d, linenum ):
+	if d < -128 or d > 127:
+		print('Invalid decimal number %s: value does not fit in 8 bits' % (where(linenum)))
+		exit()
+
+	return format( d & 0xFF, '08b' )
+
+# converts d to an 8-bit unsigned binary value
+def dec2bin8( d, linenum ):
+	if d < 0:
+		print('Invalid address %s: value is negative' % (where(linenum)))
+		exit()
+	elif d > 255:
+		print('Invalid address %s: value is larger than 255' % (where(linenum)))
+		exit()
+
+	return format( d, '08b' )
+
+
+# the values of character escapes
+ESCAPES = { "n": 10, "t": 9, "r": 13, "0": 0, "\\": 92, "'": 39 }
+
+# a character literal
+CHAR = re.compile( r"('(?:\\.|[^'\\])')" )
+
+# a run of character literals and other characters that are not spaces
+WORD = re.compile( r"(?:'(?:\\.|[^'\\])'|[^\s'])+|\S+" )
+
+# the text of a line before its comment, which may hold a '#' literal
+CODE = re.compile( r"(?:'(?:\\.|[^'\\])'|[^#])*" )
+
+# a signed term of a value
+TERM = re.compile( r"([+-]?)('(?:\\.|[^'\\])'|[^+-]+)" )
+
+# a decimal term with a leading 0
+LEADINGZERO = re.compile( r"(?:^|[+-])0[0-9]" )
+
+# parsed values of the immediate and address operands, keyed by their text
+literals = {}
+
+
+# returns the value of a single term: an int, or a label name
+def term( text ):
+	if text.startswith("'"):
+		m = CHAR.fullmatch( text )
+		if m is None:
+			return None
+		if text[1] == "\\":
+			return ESCAPES.get( text[2] )
+		return ord( text[1] )
+
+	if text[0].isdigit():
+		try:
+			if text.isdigit():
+				if len(text) > 1 and text[0] == "0":
+					return None
+				return int( text, 10 )
+			return int( text, 0 )
+		except ValueError:
+			return None
+
+	return text
+
+
+# parses an immediate or address operand into an int, or into a tuple
+# ( label, offset ) if it refers to a label
+def literal( text, linenum ):
+	if text in literals:
+		return literals[text]
+
+	label = None
+	offset = 0
+	pos = 0
+	for m in TERM.finditer( text ):
+		value = term( m.group(2) )
+		if m.start() != pos or value is None:
+			break
+		if isinstance( value, str ):
+			if label is not None or m.group(1) == "-":
+				break
+			label = value
+		elif m.group(1) == "-":
+			offset -= value
+		else:
+			offset += value
+		pos = m.end()
+
+	if pos != len(text) or pos == 0:
+		if LEADINGZERO.search( text ):
+			print('Invalid number %s: %s has a leading 0; write binary values with 0b' % (where(linenum), text))
+			exit()
+		print('Invalid number %s: %s' % (where(linenum), text))
+		exit()
+
+	if label is None:
+		literals[text] = offset
+	else:
+		literals[text] = ( label, offset )
+
+	return literals[text]
+
+
+# returns the value of an immediate or address operand, looking up the
+# label it refers to
+def operandvalue( operand, labels, linenum ):
+	if isinstance( operand, str ):
+		operand = literal( operand, linenum )
+
+	if isinstance( operand, tuple ):
+		return labeladdrvalue( operand[0], labels ) + operand[1]
+
+	return operand
+
+
+# Tokenizes the input data, discarding white space and comments
+# returns the tokens as a list of lists, one list for each line.
+#
+# The tokenizer also converts each character outside of character
+# literals to lower case, interns the words so that repeated mnemonics,
+# registers and label names share one string, and replaces the immediate and address operands
+# by their values (see literal).
+#
+# If linenums is a list, the source line number of each token list is
+# appended to it.
+def tokenize( fp, linenums=None ):
+	tokens = []
+
+	# start of the file
+	fp.seek(0)
+
+	lines = fp.readlines()
+
+	# strip white space and comments from each line
+	for linenum, line in enumerate( lines, 1 ):
+		ls = line.strip()
+		uls = CODE.match( ls ).group(0).strip()
+
+		# skip blank lines
+		if len(uls) == 0:
+			continue
+
+		# split on white space
+		words = WORD.findall( uls )
+
+		newwords = []
+		for word in words:
+			if "'" in word:
+				parts = CHAR.split( word )
+				word = ''.join( [ p if p.startswith("'") else p.lower() for p in parts ] )
+			else:
+				word = word.lower()
+			newwords.append( sys.intern( word ) )
+
+		for i in isa.NUMERIC.get( newwords[0], () ):
+			if i < len(newwords):
+				newwords[i] = literal( newwords[i], linenum )
+
+		if newwords[0] in DATA:
+			for i in range( 1, len(newwords) ):
+				newwords[i] = literal( newwords[i], linenum )
+
+		if newwords[0] == "li":
+			expanded = loadconstant( newwords, linenum )
+		else:
+			expanded = [ newwords ]
+
+		tokens.extend( expanded )
+		if linenums is not None:
+			linenums.extend( [ linenum ] * len(expanded) )
+
+	return tokens
+
+
+# returns the instruction lines of an LI pseudo-instruction
+def loadconstant( words, linenum ):
+	if len(words) != 3 or words[2] not in isa.B:
+		print('LI requires a value and a destination register on line %d' % (linenum))
+		exit()
+
+	value = literal( words[1], linenum )
+	if not isinstance( value, int ) or value < -32768 or value > 65535:
+		print('Invalid constant on line %d: %s' % (linenum, words[1]))
+		exit()
+
+	return synth.expand( value, words[2] )
+
+
+# reads through the file and returns a symbols.SymbolTable of all
+# location labels with their addresses
+def pass1( tokens ):
+	#dictionary = dict([])			# set up an empty dictionary
+	#instructions = []					# set up an empty list for the instructions
+	
+	#i = 0		
+	
+	# dictionary = { symbol : line number of the symbol, symbol : line number of the symbol }					
+	
+	#while i < len(tokens):				# read through the file
+	#	line = tokens[i]				# each line of the file
+	#	if line[-1].endswith(':'):		# if the last token in the line is a :, this indicates that it is a symbol
+	#		dictionary[ line[0]	 ] = i; # add the symbol to the dictionary
+	#		break
+	#	else: 
+	#		instructions.append(line)	# add the instruction to the list
+	#		i = i+1							# go to the next line
+	
+	# remove the lines with labels from the tokens 
+	#for i in tokens:					# for each line in the tokens list
+		#if i[-1].endswith(':'):			# if the last character in the line is a :, this indicates that it is a symbol
+		#	tokens.remove(i)			   # remove the line from the tokens list
+	
+	num = 0
+	datanum = 0
+	indata = False
+	dict = symbols.SymbolTable()
+	
+	for i in tokens:
+		if i[0] == "end":
+			break
+		elif i[0] in ( ".data", ".text" ):
+			indata = i[0] == ".data"
+		elif i[0].endswith(":"):
+			if indata:
+				dict.define( i[0][:-1], datanum, True )
+			else:
+				dict.define( i[0][:-1], num )
+		elif i[0] in DATA:
+			if not indata:
+				print('Data directive outside the data section: %s' % (linetext(i)))
+				exit()
+			datanum += datasize( i )
+		elif i[0].startswith("."):
+			continue
+		elif indata:
+			print('Instruction in the data section: %s' % (linetext(i)))
+			exit()
+		else:
+			num += 1
+	
+	return dict
+
+
+# returns the list of ( name, address ) of the program labels, leaving
+# out the labels of the data section
+def codelabels( labels ):
+	isdata = getattr( labels, "isdata", None )
+	return [ ( name, addr ) for name, addr in labels.items()
+			 if isdata is None or not isdata( name ) ]
+
+
+# returns the number of data words a data directive lays out
+def datasize( line ):
+	if line[0] == ".word":
+		return len(line) - 1
+
+	if len(line) != { ".fill": 3, ".space": 2 }[ line[0] ] or not isinstance( line[1], int ) or line[1] < 0:
+		print('Invalid directive: %s' % (linetext(line)))
+		exit()
+
+	return line[1]
+
+
+# returns the data memory image laid out by the data directives, as a
+# 256-word array, and the number of words used
+def data( tokens, labels ):
+	image = array.array( 'H', [0] ) * 256
+	num = 0
+
+	for line in tokens:
+		if line[0] == "end":
+			break
+		if line[0] not in DATA:
+			continue
+
+		size = datasize( line )
+		if num + size > 256:
+			print('Data memory full: %s' % (linetext(line)))
+			exit()
+
+		if line[0] == ".word":
+			values = line[1:]
+		elif line[0] == ".fill":
+			values = [ line[2] ] * size
+		else:
+			values = [ 0 ] * size
+
+		for value in values:
+			value = operandvalue( value, labels, linetext(line) )
+			if value < -32768 or value > 65535:
+				print('Data value out of range: %d' % (value))
+				exit()
+			image[num] = value & 0xFFFF
+			num += 1
+
+	return ( image, num )
+
+
+# returns the address of the label named by key
+def labeladdrvalue( key, labels ):
+	addr = labels.get( key )
+	if addr is None:
+		print('Undefined label: %s' % (key))
+		exit()
+
+	return addr
+
+
+# returns the 8-bit address of the label named by key
+def labeladdr( key, labels ):
+	addr = labeladdrvalue( key, labels )
+	return dec2bin8( addr, "label " + key )
+
+
+# returns the indexes in tokens of the instruction lines of the program,
+# skipping labels, directives and the data section and stopping at the
+# end marker
+def codelines( tokens ):
+	indexes = []
+	indata = False
+
+	for i in range(len(tokens)):
+		line = tokens[i]
+		if line[0] == "end":
+			break
+		if line[0] in ( ".data", ".text" ):
+			indata = line[0] == ".data"
+		if indata or line[0].endswith(":") or line[0].startswith("."):
+			continue
+		indexes.append( i )
+
+	return indexes
+
+
+# returns the instruction lines of the program
+def program( tokens ):
+	return [ tokens[i] for i in codelines( tokens ) ]
+
+
+# returns the source line number of each program location, given the
+# line numbers recorded by tokenize
+def addresslines( tokens, linenums ):
+	return [ linenums[i] for i in codelines( tokens ) ]
+
+
+# returns the text of an instruction line, with the values tokenize
+# parsed written back in decimal
+def linetext( instruction ):
+	words = []
+	for word in instruction:
+		if isinstance( word, tuple ):
+			word = "%s%+d" % word
+		words.append( str(word) )
+
+	return ' '.join( words )
+
+
+# returns the list of ( operand index, label, offset ) of the operands of
+# an instruction that refer to labels, or None if there are none
+def symbolic( instruction ):
+	found = []
+	for i in isa.SYMBOLIC.get( instruction[0], () ):
+		if i >= len(instruction):
+			continue
+		operand = instruction[i]
+		if isa.FIELDS[ instruction[0] ][i] == isa.LABEL:
+			found.append( ( i, operand, 0 ) )
+			continue
+		if isinstance( operand, str ):
+			operand = literal( operand, 0 )
+		if isinstance( operand, tuple ):
+			found.append( ( i, operand[0], operand[1] ) )
+
+	return found or None
+
+
+# encodings of the instructions without a label operand, which do not
+# depend on the label table, keyed by the tuple of their tokens
+encoded = {}
+
+
+# builds the machine instructions from the instruction formats in isa
+#
+# If linenums holds the line numbers recorded by tokenize, errors give the
+# source line, otherwise the instruction text.
+def pass2( tokens, labels, linenums=None ):
+
+	binaryinstructions = []				# list to hold the instructions
+	lines = None
+	if linenums is not None:
+		lines = addresslines( tokens, linenums )
+	
+	for addr, instruction in enumerate( program( tokens ) ):
+		key = tuple( instruction )
+		if key in encoded:
+			binaryinstructions.append( encoded[key] )
+			continue
+
+		if lines is not None:
+			linenum = lines[addr]
+		else:
+			linenum = linetext( instruction )
+
+		entry = isa.FORMATS.get( instruction[0] )
+		if entry is None:
+			print('Invalid instruction: %s' % (linetext(instruction)))
+			exit()
+
+		message, fields = entry
+		if len(instruction) < isa.LENGTHS[ instruction[0] ]:
+			print(message)
+			exit()
+
+		code = " "
+		for field in fields:
+			if isinstance( field, str ):
+				code += field
+				continue
+
+			kind, i = field
+			if isinstance( kind, dict ):
+				code += kind.get( instruction[i], "" )
+			elif kind == isa.LABEL:
+				code += labeladdr( instruction[i], labels )
+			elif kind == isa.IMMEDIATE:
+				code += dec2comp8( operandvalue( instruction[i], labels, linenum ), linenum )
+			else:
+				code += dec2bin8( operandvalue( instruction[i], labels, linenum ), linenum )
+		
+		if len(code) != 17:
+			print('Invalid instruction: %s' % (linetext(instruction)))
+			exit()
+
+		if symbolic( instruction ) is None:
+			encoded[key] = code
+				
+		binaryinstructions.append(code)		# add the instruction to the list
+	
+	return binaryinstructions				# return the list of instructions
+
+# converts the instruction strings from pass2 to 16-bit integer words
+def towords( instructions ):
+	words = []
+
+	for code in instructions:
+		words.append( int(code, 2) )
+
+	return words
+
+
+# returns the text of a 256x16 memory file holding the words, with the
+# unused locations filled with fill (ones for program memory)
+def mif( name, words, memory="program", fill=0xFFFF ):
+	if len(words) > 256:
+		print('Program too large: %d words' % (len(words)))
+		exit()
+
+	lines = ["-- %s memory file for %s" % (memory, name),
+			 "DEPTH = 256;",
+			 "WIDTH = 16;",
+			 "ADDRESS_RADIX = HEX;",
+			 "DATA_RADIX = BIN;",
+			 "CONTENT",
+			 "BEGIN"]
+
+	for addr in range(len(words)):
+		lines.append("%02X : %s;" % (addr, format(words[addr], '016b')))
+
+	if len(words) < 256:
+		lines.append("[%02X..FF] : %s;" % (len(words), format(fill, '016b')))
+
+	lines.append("END;")
+
+	return "\n".join(lines) + "\n"
+
+
+# returns the name of the data memory file that goes with a program
+# memory file
+def dataname( name ):
+	if name.endswith(".mif"):
+		name = name[:-4]
+	return name + "_data.mif"
+
+
+def main( argv ):
+	if len(argv) < 3:
+		print('Usage: python %s <filename> <output.mif> [<data.mif>]' % (argv[0]))
+		exit()
+
+	fp = open( argv[1], 'r' )				# read the text file
+	
+	linenums = []
+	tokens = tokenize( fp, linenums )
+	dict = pass1(tokens)
+	instructions = pass2(tokens, dict, linenums)
+	
+	fp.close()
+	
+	text = mif( argv[2], towords(instructions) )
+
+	# the data image, if the program lays out any data
+	image, size = data( tokens, dict )
+	files = [ ( argv[2], text ) ]
+	if size:
+		name = argv[3] if len(argv) > 3 else dataname( argv[2] )
+		files.append( ( name, mif( name, image[:size], "data", 0 ) ) )
+
+	for name, content in files:
+		fp = open( name, 'w')				# write to the .mif files
+		fp.write(content)
+		fp.close()
+
+	print( "\n".join( [ content for name, content in files ] ) )
+
+	return
@@ -0,0 +1,283 @@
+# Batch simulation of one program image against many input vectors
+#
+# usage: python assembler.py batch <filename> <vectors> [lanes]
+#
+# The vectors file holds one input sequence per line, as whitespace
+# separated integers read in turn by IPORT.  For each vector the OPORT
+# trace, the cycle count and the final status are reported.
+#
+# Two ways of running are provided:
+#
+# - runbatch fans the vectors out over a pool of worker processes, each
+# - running the scalar simulator.
+#
+# - runlanes runs all vectors in lockstep as one NumPy machine state, with
+# - every register and memory word an array across the lanes.  At each
+# - step the active lanes are grouped by PC and each group executes its
+# - instruction as one vector operation.  NumPy is optional; it is only
+# - needed for runlanes.
+#
+
+import multiprocessing
+
+from . import assembler
+from . import simulator
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# program and data images of a worker process, set once by the pool
+# initializer
+_words = None
+_data = None
+
+
+def _initworker( words, data ):
+	global _words, _data
+	_words = words
+	_data = data
+
+
+def _runvector( args ):
+	inputs, maxsteps = args
+	sim = simulator.Simulator( _words, inputs, data=_data )
+	status = sim.run( maxsteps )
+	return ( sim.output, sim.cycles, status )
+
+
+# runs the program once for each input vector and returns a list of
+# ( output trace, cycles, status ), one for each vector; data is the
+# initial data memory image
+def runbatch( words, vectors, maxsteps=1000000, workers=None, data=() ):
+	if workers is None:
+		workers = multiprocessing.cpu_count()
+
+	jobs = [ ( list(inputs), maxsteps ) for inputs in vectors ]
+
+	if workers <= 1 or len(jobs) < 2:
+		_initworker( list(words), list(data) )
+		return [ _runvector( job ) for job in jobs ]
+
+	pool = multiprocessing.Pool( workers, _initworker, (list(words), list(data)) )
+	try:
+		results = pool.map( _runvector, jobs, max( 1, len(jobs) // (workers * 4) ) )
+	finally:
+		pool.close()
+		pool.join()
+
+	return results
+
+
+# runs the program for all input vectors in lockstep using NumPy and
+# returns the same results as runbatch
+def runlanes( words, vectors, maxsteps=1000000, cycles=simulator.CYCLES, data=() ):
+	if numpy is None:
+		raise ImportError( 'runlanes needs numpy' )
+
+	sim = simulator.Simulator( words, cycles=cycles, data=data )
+	code = sim.code
+	image = sim.words
+	costs = sim.costs
+
+	n = len(vectors)
+	width = max( [ len(v) for v in vectors ] + [ 1 ] )
+	inputs = numpy.zeros( ( n, width ), numpy.int64 )
+	lengths = numpy.zeros( n, numpy.int64 )
+	for lane in range(n):
+		lengths[lane] = len(vectors[lane])
+		inputs[ lane, :len(vectors[lane]) ] = numpy.array( vectors[lane], numpy.int64 ) & 0xFFFF
+
+	regs = numpy.zeros( ( 6, n ), numpy.int64 )
+	mem = numpy.zeros( ( 256, n ), numpy.int64 )
+	mem[:] = numpy.array( sim.data, numpy.int64 )[ :, None ]
+	pc = numpy.zeros( n, numpy.int64 )
+	ir = numpy.zeros( n, numpy.int64 )
+	cr = numpy.zeros( n, numpy.int64 )
+	inpos = numpy.zeros( n, numpy.int64 )
+	spent = numpy.zeros( n, numpy.int64 )
+	active = numpy.ones( n, bool )
+	status = [ "steps" ] * n
+	outputs = [ [] for lane in range(n) ]
+
+	# value of a table E source for the lanes ix
+	def source( s, ix ):
+		if s < 6:
+			return regs[ s, ix ]
+		return numpy.full( len(ix), 0 if s == 6 else 0xFFFF, numpy.int64 )
+
+	step = 0
+	while step < maxsteps and active.any():
+		step += 1
+		live = numpy.nonzero( active )[0]
+		here = pc[live]
+
+		for p in numpy.unique( here ):
+			p = int(p)
+			ix = live[ here == p ]
+			op, a, b, c = code[p]
+
+			if op == simulator.INVALID:
+				active[ix] = False
+				for lane in ix:
+					status[lane] = "invalid"
+				continue
+
+			ir[ix] = image[p]
+			spent[ix] += costs[p]
+			nextpc = (p + 1) & 0xFF
+			pc[ix] = nextpc
+
+			if op == simulator.MOVEI:
+				regs[ c, ix ] = b & 0xFFFF
+
+			elif op == simulator.MOVE:
+				if a < 6:
+					regs[ c, ix ] = regs[ a, ix ]
+				elif a == 6:
+					regs[ c, ix ] = nextpc
+				else:
+					regs[ c, ix ] = image[p]
+
+			elif op >= simulator.ADD:
+				x = source( a, ix )
+				flags = numpy.zeros( len(ix), numpy.int64 )
+
+				if op == simulator.ADD:
+					y = source( b, ix )
+					r = x + y
+					flags |= numpy.where( r > 0xFFFF, 8, 0 )
+					r &= 0xFFFF
+					flags |= numpy.where( (x ^ r) & (y ^ r) & 0x8000, 4, 0 )
+				elif op == simulator.SUB:
+					y = source( b, ix )
+					r = x - y
+					flags |= numpy.where( r < 0, 8, 0 )
+					r &= 0xFFFF
+					flags |= numpy.where( (x ^ y) & (x ^ r) & 0x8000, 4, 0 )
+				elif op == simulator.AND:
+					r = x & source( b, ix )
+				elif op == simulator.OR:
+					r = x | source( b, ix )
+				elif op == simulator.XOR:
+					r = x ^ source( b, ix )
+				elif op == simulator.SHIFTL:
+					r = (x << 1) & 0xFFFF
+					flags |= numpy.where( x & 0x8000, 8, 0 )
+				elif op == simulator.SHIFTR:
+					r = (x >> 1) | (x & 0x8000)
+					flags |= numpy.where( x & 1, 8, 0 )
+				elif op == simulator.ROTL:
+					r = ((x << 1) | (x >> 15)) & 0xFFFF
+				else:
+					r = (x >> 1) | ((x & 1) << 15)
+
+				flags |= numpy.where( r == 0, 1, 0 )
+				flags |= numpy.where( r & 0x8000, 2, 0 )
+				regs[ c, ix ] = r
+				cr[ix] = flags
+
+			elif op <= simulator.STOREA:
+				addr = numpy.full( len(ix), b, numpy.int64 )
+				if op == simulator.LOADA or op == simulator.STOREA:
+					addr = (b + regs[ 4, ix ]) & 0xFF
+				if op <= simulator.LOADA:
+					regs[ a, ix ] = mem[ addr, ix ]
+				else:
+					mem[ addr, ix ] = regs[ a, ix ]
+
+			elif op == simulator.BRA:
+				pc[ix] = b
+
+			elif op == simulator.BRC:
+				pc[ix] = numpy.where( (cr[ix] >> a) & 1, b, nextpc )
+
+			elif op == simulator.CALL:
+				sp = regs[ 5, ix ]
+				mem[ sp & 0xFF, ix ] = nextpc
+				mem[ (sp + 1) & 0xFF, ix ] = cr[ix]
+				regs[ 5, ix ] = (sp + 2) & 0xFFFF
+				pc[ix] = b
+
+			elif op == simulator.RETURN:
+				sp = regs[ 5, ix ]
+				cr[ix] = mem[ (sp - 1) & 0xFF, ix ] & 0xF
+				pc[ix] = mem[ (sp - 2) & 0xFF, ix ] & 0xFF
+				regs[ 5, ix ] = (sp - 2) & 0xFFFF
+
+			elif op == simulator.HALT:
+				active[ix] = False
+				for lane in ix:
+					status[lane] = "halt"
+
+			elif op == simulator.PUSH:
+				if a < 6:
+					v = regs[ a, ix ]
+				elif a == 6:
+					v = nextpc
+				else:
+					v = cr[ix]
+				sp = regs[ 5, ix ]
+				mem[ sp & 0xFF, ix ] = v
+				regs[ 5, ix ] = (sp + 1) & 0xFFFF
+
+			elif op == simulator.POP:
+				sp = (regs[ 5, ix ] - 1) & 0xFFFF
+				regs[ 5, ix ] = sp
+				v = mem[ sp & 0xFF, ix ]
+				if a < 6:
+					regs[ a, ix ] = v
+				elif a == 6:
+					pc[ix] = v & 0xFF
+				else:
+					cr[ix] = v & 0xF
+
+			elif op == simulator.OPORT:
+				if a < 6:
+					v = regs[ a, ix ]
+				elif a == 6:
+					v = numpy.full( len(ix), nextpc, numpy.int64 )
+				else:
+					v = ir[ix]
+				for lane, value in zip( ix, v ):
+					outputs[lane].append( int(value) )
+
+			else:
+				pos = inpos[ix]
+				has = pos < lengths[ix]
+				regs[ a, ix ] = numpy.where( has, inputs[ ix, numpy.minimum( pos, width - 1 ) ], 0 )
+				inpos[ix] = pos + has
+
+	return [ ( outputs[lane], int(spent[lane]), status[lane] ) for lane in range(n) ]
+
+
+def main( argv ):
+	if len(argv) < 3:
+		print('Usage: python %s <filename> <vectors> [lanes]' % (argv[0]))
+		exit()
+
+	fp = open( argv[1], 'r' )
+	tokens = assembler.tokenize( fp )
+	fp.close()
+	labels = assembler.pass1( tokens )
+	words = assembler.towords( assembler.pass2( tokens, labels ) )
+	image, size = assembler.data( tokens, labels )
+
+	fp = open( argv[2], 'r' )
+	vectors = [ [ int(v) for v in line.split() ] for line in fp ]
+	fp.close()
+
+	if len(argv) > 3 and argv[3] == "lanes":
+		if numpy is None:
+			print('Running in lanes needs numpy')
+			exit()
+		results = runlanes( words, vectors, data=image[:size] )
+	else:
+		results = runbatch( words, vectors, data=image[:size] )
+
+	for i in range(len(results)):
+		output, cycles, status = results[i]
+		print('%4d %-7s %8d cycles  %s' % (i, status, cycles, ' '.join( str(v) for v in output )))
+
+	return
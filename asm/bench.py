@@ -0,0 +1,88 @@
+# Benchmarks for the assembler on synthetic programs
+#
+# usage: python assembler.py bench [<number of lines> [<max workers>]]
+#
+# Generates a program of the given size and reports the time pass 2 takes
+# when run directly and on a pool of 1 to N worker processes.
+#
+
+import random
+import time
+
+from . import assembler
+from . import parallel
+
+REGISTERS = [ "ra", "rb", "rc", "rd", "re", "sp" ]
+SOURCES = REGISTERS + [ "0000000000000000", "1111111111111111" ]
+
+
+# returns the tokens of a synthetic program of n instructions; branch
+# targets are kept in the first 256 locations so every address fits in
+# the 8-bit address field
+def synthetic( n, seed=1 ):
+	rnd = random.Random( seed )
+	tokens = []
+	labels = []
+
+	for i in range(n):
+		if i < 240 and i % 16 == 0:
+			labels.append( "l%d" % (i) )
+			tokens.append( [ labels[-1] + ":" ] )
+
+		kind = rnd.randrange(6)
+		if kind == 0:
+			tokens.append( [ "movei", str(rnd.randrange(-127, 128)), rnd.choice(REGISTERS) ] )
+		elif kind == 1:
+			tokens.append( [ rnd.choice(["add", "sub", "and", "or", "xor"]),
+							 rnd.choice(SOURCES), rnd.choice(SOURCES), rnd.choice(REGISTERS) ] )
+		elif kind == 2:
+			tokens.append( [ rnd.choice(["shiftl", "shiftr", "rotl", "rotr"]),
+							 rnd.choice(SOURCES), rnd.choice(REGISTERS) ] )
+		elif kind == 3:
+			tokens.append( [ rnd.choice(["push", "pop"]), rnd.choice(REGISTERS) ] )
+		elif kind == 4 and labels:
+			tokens.append( [ rnd.choice(["bra", "braz", "bran", "brao", "brac", "call"]),
+							 rnd.choice(labels) ] )
+		else:
+			tokens.append( [ "move", rnd.choice(REGISTERS), rnd.choice(REGISTERS) ] )
+
+	tokens.append( [ "halt" ] )
+
+	return tokens
+
+
+# returns the best of repeat timings of f()
+def timeit( f, repeat=3 ):
+	best = None
+	for i in range(repeat):
+		t0 = time.perf_counter()
+		f()
+		t = time.perf_counter() - t0
+		if best is None or t < best:
+			best = t
+
+	return best
+
+
+def main( argv ):
+	n = 200000
+	maxworkers = parallel.multiprocessing.cpu_count()
+	if len(argv) > 1:
+		n = int(argv[1])
+	if len(argv) > 2:
+		maxworkers = int(argv[2])
+
+	tokens = synthetic( n )
+	labels = assembler.pass1( tokens )
+
+	serial = timeit( lambda: assembler.pass2( tokens, labels ) )
+	print('%d lines' % (n))
+	print('pass2      : %8.3f s' % (serial))
+
+	# always use the pool, which pass2parallel skips for one worker
+	lines = assembler.program( tokens )
+	for workers in range( 1, maxworkers + 1 ):
+		t = timeit( lambda: parallel.pass2pool( lines, labels, workers ) )
+		print('%2d workers : %8.3f s  speedup %.2f' % (workers, t, serial / t))
+
+	return
@@ -0,0 +1,307 @@
+# Control-flow graph of an assembled program
+#
+# usage: python assembler.py cfg <filename>
+#
+# Splits the program words into basic blocks and links them with indexed
+# successor arrays:
+#
+# - a block ends at a branch, CALL, RETURN, HALT or invalid word, and
+# - starts at address 0, at a branch or CALL target and after the end of
+# - another block
+#
+# - BRA has its target as successor, a conditional branch the next block
+# - and its target, CALL the next block (the call itself is recorded in
+# - calls), RETURN and HALT have none
+#
+# A routine is address 0 or the target of a CALL; its body is the blocks
+# reached from its entry without following calls.  The worst-case stack
+# depth of a routine counts PUSH as 1, POP as -1 and CALL as the 2 words
+# it pushes plus the depth of the routine called.  A routine whose depth
+# cannot be bounded (recursion, or a loop that does not balance PUSH and
+# POP) has depth None.
+#
+# Every step is linear in the number of words.
+#
+
+import array
+
+from . import assembler
+from . import simulator
+
+
+class Graph:
+
+	def __init__( self, words, labels=None ):
+		self.words = list( words )
+		self.code = [ simulator.decode(word) for word in self.words ]
+		self.labels = labels or {}
+		self.problems = []
+
+		self.findblocks()
+		self.linkblocks()
+		self.findreachable()
+		self.findroutines()
+
+	# splits the program into blocks; start[i] and end[i] are the first
+	# address of block i and the address after its last instruction, and
+	# blockof[addr] is the block holding addr
+	def findblocks( self ):
+		n = len(self.code)
+		leader = bytearray( n + 1 )
+		if n:
+			leader[0] = 1
+
+		for addr in range(n):
+			op, a, b, c = self.code[addr]
+			if op in ( simulator.BRA, simulator.BRC, simulator.CALL ):
+				if b < n:
+					leader[b] = 1
+				else:
+					self.problems.append( "%02X: target %02X is outside the program" % (addr, b) )
+			if op in ( simulator.BRA, simulator.BRC, simulator.CALL, simulator.RETURN,
+					   simulator.HALT, simulator.INVALID ) or ( op == simulator.POP and a == 6 ):
+				leader[addr + 1] = 1
+
+		self.start = array.array( 'l' )
+		self.end = array.array( 'l' )
+		self.blockof = array.array( 'l', [0] ) * n
+		for addr in range(n):
+			if leader[addr]:
+				if len(self.start):
+					self.end.append( addr )
+				self.start.append( addr )
+			self.blockof[addr] = len(self.start) - 1
+		if n:
+			self.end.append( n )
+
+	# builds the successor arrays: the successors of block i are
+	# succ[ first[i] : first[i+1] ]; calls holds ( block, target address )
+	def linkblocks( self ):
+		n = len(self.code)
+		self.first = array.array( 'l' )
+		self.succ = array.array( 'l' )
+		self.calls = []
+
+		for i in range(len(self.start)):
+			self.first.append( len(self.succ) )
+			last = self.end[i] - 1
+			op, a, b, c = self.code[last]
+			follow = self.end[i] < n
+
+			if op == simulator.BRA:
+				targets = [ b ]
+			elif op == simulator.BRC:
+				targets = [ self.end[i], b ]
+			elif op == simulator.CALL:
+				targets = [ self.end[i] ]
+				if b < n:
+					self.calls.append( ( i, b ) )
+			elif op in ( simulator.RETURN, simulator.HALT, simulator.INVALID ):
+				targets = []
+				if op == simulator.INVALID:
+					self.problems.append( "%02X: invalid instruction" % (last) )
+			elif op == simulator.POP and a == 6:
+				targets = []
+				self.problems.append( "%02X: POP PC jumps to an unknown address" % (last) )
+			else:
+				targets = [ self.end[i] ]
+				if not follow:
+					self.problems.append( "%02X: execution runs past the end of the program" % (last) )
+
+			for target in targets:
+				if target < n and self.blockof[target] not in self.succ[ self.first[i]: ]:
+					self.succ.append( self.blockof[target] )
+
+		self.first.append( len(self.succ) )
+
+	# returns the successor blocks of block i
+	def successors( self, i ):
+		return self.succ[ self.first[i] : self.first[i+1] ]
+
+	# marks the blocks reached from address 0, following calls
+	def findreachable( self ):
+		self.reachable = bytearray( len(self.start) )
+		callees = [ [] for i in range(len(self.start)) ]
+		for block, target in self.calls:
+			callees[block].append( self.blockof[target] )
+
+		stack = []
+		if len(self.start):
+			self.reachable[0] = 1
+			stack.append( 0 )
+		while stack:
+			i = stack.pop()
+			for j in list( self.successors(i) ) + callees[i]:
+				if not self.reachable[j]:
+					self.reachable[j] = 1
+					stack.append( j )
+
+	# returns the list of ( start, end ) address ranges that are never reached
+	def unreachable( self ):
+		ranges = []
+		for i in range(len(self.start)):
+			if not self.reachable[i]:
+				if ranges and ranges[-1][1] == self.start[i]:
+					ranges[-1] = ( ranges[-1][0], self.end[i] )
+				else:
+					ranges.append( ( self.start[i], self.end[i] ) )
+
+		return ranges
+
+	# finds the routines, their bodies and the call graph
+	#
+	# routines is the sorted list of entry addresses, body[entry] the list
+	# of its blocks and callgraph[entry] the sorted entries it calls
+	def findroutines( self ):
+		entries = set( target for block, target in self.calls )
+		if len(self.start):
+			entries.add( 0 )
+		self.routines = sorted( entries )
+
+		callsof = {}
+		for block, target in self.calls:
+			callsof.setdefault( block, [] ).append( target )
+
+		self.body = {}
+		self.callgraph = {}
+		for entry in self.routines:
+			seen = set( [ self.blockof[entry] ] )
+			order = [ self.blockof[entry] ]
+			for i in order:
+				for j in self.successors(i):
+					if j not in seen:
+						seen.add( j )
+						order.append( j )
+			self.body[entry] = order
+
+			callees = set()
+			for i in order:
+				callees.update( callsof.get( i, [] ) )
+			self.callgraph[entry] = sorted( callees )
+
+	# returns ( net change, peak ) of the stack depth over block i, where
+	# the peak counts the depth of the routines called
+	def blockstack( self, i, depths ):
+		depth = 0
+		peak = 0
+		for addr in range( self.start[i], self.end[i] ):
+			op, a, b, c = self.code[addr]
+			if op == simulator.PUSH:
+				depth += 1
+			elif op == simulator.POP:
+				depth -= 1
+			elif op == simulator.CALL:
+				if depths.get(b) is None:
+					return None
+				peak = max( peak, depth + 2 + depths[b] )
+			peak = max( peak, depth )
+
+		return ( depth, peak )
+
+	# returns a dictionary from each routine entry to its worst-case stack
+	# depth in words, or None if it cannot be bounded
+	def stackdepths( self ):
+		depths = {}
+		state = {}
+
+		# visit the call graph in post order, so callees come first
+		for root in self.routines:
+			if root in state:
+				continue
+			stack = [ ( root, 0 ) ]
+			state[root] = 1
+			while stack:
+				entry, k = stack.pop()
+				callees = self.callgraph[entry]
+				if k < len(callees):
+					stack.append( ( entry, k + 1 ) )
+					callee = callees[k]
+					if callee not in state:
+						state[callee] = 1
+						stack.append( ( callee, 0 ) )
+					elif state[callee] == 1:
+						# recursion: the routines on the cycle, and those
+						# calling them, are unbounded
+						depths[callee] = None
+						for e, j in stack:
+							depths[e] = None
+					continue
+
+				state[entry] = 2
+				if entry not in depths:
+					depths[entry] = self.routinestack( entry, depths )
+
+		return depths
+
+	# returns the worst-case stack depth of one routine, given the depths
+	# of the routines it calls
+	def routinestack( self, entry, depths ):
+		first = self.blockof[entry]
+		depthat = { first: 0 }
+		worst = 0
+
+		for i in self.body[entry]:
+			effect = self.blockstack( i, depths )
+			if effect is None:
+				return None
+			net, peak = effect
+			worst = max( worst, depthat[i] + peak )
+			for j in self.successors(i):
+				if j not in depthat:
+					depthat[j] = depthat[i] + net
+				elif depthat[j] != depthat[i] + net:
+					return None
+
+		return worst
+
+	# returns the text of the graph report
+	def report( self ):
+		names = {}
+		for label, value in assembler.codelabels( self.labels ):
+			names.setdefault( value, label )
+
+		out = []
+		out.append( "block  start  end  successors" )
+		for i in range(len(self.start)):
+			mark = "" if self.reachable[i] else "  (unreachable)"
+			label = names.get( self.start[i], "" )
+			out.append( "%5d  %02X-%02X  %-10s %s%s" % (i, self.start[i], self.end[i] - 1, label,
+													   ' '.join( str(j) for j in self.successors(i) ), mark) )
+
+		out.append( "" )
+		out.append( "routine      stack  calls" )
+		depths = self.stackdepths()
+		for entry in self.routines:
+			depth = depths[entry]
+			if depth is None:
+				depth = "unbounded"
+			out.append( "%-12s %5s  %s" % (names.get( entry, "%02X" % (entry) ), depth,
+										   ' '.join( names.get( e, "%02X" % (e) ) for e in self.callgraph[entry] )) )
+
+		for start, end in self.unreachable():
+			out.append( "unreachable code at %02X-%02X" % (start, end - 1) )
+		for problem in self.problems:
+			out.append( problem )
+
+		return "\n".join( out )
+
+
+def main( argv ):
+	if len(argv) < 2:
+		print('Usage: python %s <filename>' % (argv[0]))
+		exit()
+
+	fp = open( argv[1], 'r' )
+	tokens = assembler.tokenize( fp )
+	fp.close()
+
+	labels = assembler.pass1( tokens )
+	words = assembler.towords( assembler.pass2( tokens, labels ) )
+
+	graph = Graph( words, labels )
+	print( graph.report() )
+
+	if graph.problems:
+		exit(1)
+
+	return
@@ -0,0 +1,386 @@
+# Register usage and dataflow analysis
+#
+# usage: python assembler.py dataflow <filename>
+#
+# Register sets are ints used as bit vectors, bit n for register n of
+# table B (RA RB RC RD RE SP) and bit 6 for CR.  The table E constants and
+# PC and IR of table D are not registers and are never tracked.
+#
+# Two analyses run over the blocks of a cfg.Graph:
+#
+# - a forward analysis of the registers written on every path from
+# - address 0, which reports reads of registers that may not have been
+# - written yet (SP and CR are set at reset and count as written)
+#
+# - a backward liveness analysis, which reports writes whose value is
+# - never read and gives the live range of every register
+#
+# A CALL counts as reading every register the routine called (or any
+# routine it calls) may read.  For the forward analysis it writes the
+# registers the routine writes on every path from its entry to a RETURN;
+# liveness counts it as writing none of them, since it may not.
+# RETURN reads the registers live where it may return to: after every
+# CALL of a routine whose body holds it.  A return from a routine that is
+# never called, or to past the end of the program, keeps every register
+# live.
+#
+# Both analyses iterate over blocks with a worklist, so they take time
+# linear in the program size times the (small) number of passes.
+#
+
+from . import assembler
+from . import cfg
+from . import simulator
+
+SP = 1 << 5
+CR = 1 << 6
+ALL = (1 << 7) - 1
+NAMES = simulator.TABLEB + [ "cr" ]
+
+
+# returns the bit of a register of table C or D, or 0 for PC, IR and the
+# table E constants
+def bit( reg, table=simulator.TABLEB ):
+	if reg < 6:
+		return 1 << reg
+	if table is simulator.TABLEC and reg == 7:
+		return CR
+	return 0
+
+
+# returns ( uses, defs, destination ) of a decoded instruction, leaving
+# out the effect of the routine a CALL calls; destination is the bit of
+# the register the instruction names as its destination, or 0
+def effect( inst ):
+	op, a, b, c = inst
+
+	if op == simulator.LOAD:
+		return ( 0, 1 << a, 1 << a )
+	if op == simulator.LOADA:
+		return ( 1 << 4, 1 << a, 1 << a )
+	if op == simulator.STORE:
+		return ( 1 << a, 0, 0 )
+	if op == simulator.STOREA:
+		return ( (1 << a) | (1 << 4), 0, 0 )
+	if op == simulator.BRC:
+		return ( CR, 0, 0 )
+	if op == simulator.CALL:
+		return ( SP | CR, SP, 0 )
+	if op == simulator.RETURN:
+		return ( SP, SP | CR, 0 )
+	if op == simulator.PUSH:
+		return ( bit( a, simulator.TABLEC ) | SP, SP, 0 )
+	if op == simulator.POP:
+		dest = bit( a, simulator.TABLEC )
+		return ( SP, dest | SP, dest )
+	if op == simulator.OPORT:
+		return ( bit(a), 0, 0 )
+	if op == simulator.IPORT:
+		return ( 0, 1 << a, 1 << a )
+	if simulator.ADD <= op <= simulator.XOR:
+		return ( bit(a) | bit(b), (1 << c) | CR, 1 << c )
+	if simulator.SHIFTL <= op <= simulator.ROTR:
+		return ( bit(a), (1 << c) | CR, 1 << c )
+	if op == simulator.MOVE:
+		return ( bit(a), 1 << c, 1 << c )
+	if op == simulator.MOVEI:
+		return ( 0, 1 << c, 1 << c )
+
+	return ( 0, 0, 0 )
+
+
+# returns the names of the registers in a set
+def names( regs ):
+	return [ NAMES[i] for i in range(len(NAMES)) if regs >> i & 1 ]
+
+
+class Dataflow:
+
+	def __init__( self, graph ):
+		self.graph = graph
+		n = len(graph.code)
+		self.uses = [0] * n
+		self.defs = [0] * n
+		self.dest = [0] * n
+		for addr in range(n):
+			self.uses[addr], self.defs[addr], self.dest[addr] = effect( graph.code[addr] )
+
+		self.summarize()
+		self.findreturns()
+		self.findwritten()
+		self.findlive()
+
+	# adds to each CALL the registers the routine called may read and write
+	def summarize( self ):
+		graph = self.graph
+		mayuse = {}
+		for entry in graph.routines:
+			u = 0
+			for i in graph.body[entry]:
+				for addr in range( graph.start[i], graph.end[i] ):
+					u |= self.uses[addr]
+			mayuse[entry] = u
+
+		# pass the sets up the call graph until nothing changes
+		changed = True
+		while changed:
+			changed = False
+			for entry in graph.routines:
+				u = mayuse[entry]
+				for callee in graph.callgraph[entry]:
+					u |= mayuse[callee]
+				if u != mayuse[entry]:
+					mayuse[entry] = u
+					changed = True
+
+		# narrow the must-write sets from ALL until nothing changes, which
+		# also settles recursive routines
+		mustdef = dict( ( entry, ALL ) for entry in graph.routines )
+		changed = True
+		while changed:
+			changed = False
+			for entry in graph.routines:
+				d = self.mustwrite( entry, mustdef )
+				if d != mustdef[entry]:
+					mustdef[entry] = d
+					changed = True
+
+		self.calledit = {}
+		for block, target in graph.calls:
+			addr = graph.end[block] - 1
+			self.uses[addr] |= mayuse[target]
+			self.calledit[addr] = mustdef[target] & ~SP
+
+	# returns the registers the routine at entry writes on every path from
+	# its entry to a RETURN, given the sets of the routines it calls; a
+	# routine that never returns writes ALL
+	def mustwrite( self, entry, mustdef ):
+		graph = self.graph
+		called = dict( graph.calls )
+
+		def out( i ):
+			state = written[i]
+			for addr in range( graph.start[i], graph.end[i] ):
+				state |= self.defs[addr]
+			if i in called:
+				state |= mustdef[ called[i] ]
+			return state
+
+		first = graph.blockof[entry]
+		written = { first: 0 }
+		work = [ first ]
+		while work:
+			i = work.pop()
+			state = out( i )
+			for j in graph.successors(i):
+				if j not in written or written[j] & state != written[j]:
+					written[j] = written.get( j, ALL ) & state
+					work.append( j )
+
+		result = ALL
+		for i in written:
+			if graph.code[ graph.end[i] - 1 ][0] == simulator.RETURN:
+				result &= out( i )
+
+		return result
+
+	# finds the blocks each block ending in RETURN may return to: the
+	# blocks after the CALLs of every routine whose body holds it, with -1
+	# for an unknown place, where every register counts as live
+	def findreturns( self ):
+		graph = self.graph
+		n = len(graph.code)
+		after = {}
+		for block, target in graph.calls:
+			if graph.end[block] < n:
+				after.setdefault( target, set() ).add( graph.blockof[ graph.end[block] ] )
+			else:
+				after.setdefault( target, set() ).add( -1 )
+
+		self.returnsto = {}
+		for i in range(len(graph.start)):
+			if graph.code[ graph.end[i] - 1 ][0] == simulator.RETURN:
+				self.returnsto[i] = set()
+		for entry in graph.routines:
+			for i in graph.body[entry]:
+				if i in self.returnsto:
+					self.returnsto[i] |= after.get( entry, set( [ -1 ] ) )
+		for i in self.returnsto:
+			if not self.returnsto[i]:
+				self.returnsto[i].add( -1 )
+
+	# forward analysis: written[i] is the set of registers written on
+	# every path to the start of block i
+	def findwritten( self ):
+		graph = self.graph
+		count = len(graph.start)
+		written = [ ALL ] * count
+		blockdefs = [0] * count
+		for i in range(count):
+			for addr in range( graph.start[i], graph.end[i] ):
+				blockdefs[i] |= self.defs[addr]
+
+		# the state at a call, before the routine called writes anything
+		targets = {}
+		for block, target in graph.calls:
+			targets.setdefault( block, [] ).append( graph.blockof[target] )
+
+		if count:
+			written[0] = SP | CR
+		work = list( range(count) )
+		queued = [ True ] * count
+		while work:
+			i = work.pop()
+			queued[i] = False
+			out = written[i] | blockdefs[i]
+			flows = [ ( j, out | self.calledit.get( graph.end[i] - 1, 0 ) ) for j in graph.successors(i) ]
+			flows += [ ( j, out ) for j in targets.get( i, [] ) ]
+			for j, state in flows:
+				if j == 0:
+					state &= SP | CR
+				if written[j] & state != written[j]:
+					written[j] &= state
+					if not queued[j]:
+						queued[j] = True
+						work.append( j )
+
+		self.written = written
+
+	# backward analysis: livein[i] is the set of registers live at the
+	# start of block i
+	def findlive( self ):
+		graph = self.graph
+		count = len(graph.start)
+		livein = [0] * count
+		preds = [ [] for i in range(count) ]
+		for i in range(count):
+			for j in graph.successors(i):
+				preds[j].append( i )
+		for i in self.returnsto:
+			for j in self.returnsto[i]:
+				if j >= 0:
+					preds[j].append( i )
+
+		work = list( range(count) )
+		queued = [ True ] * count
+		while work:
+			i = work.pop()
+			queued[i] = False
+			live = self.liveout( i, livein )
+			for addr in range( graph.end[i] - 1, graph.start[i] - 1, -1 ):
+				live = self.uses[addr] | ( live & ~self.defs[addr] )
+			if live != livein[i]:
+				livein[i] = live
+				for p in preds[i]:
+					if not queued[p]:
+						queued[p] = True
+						work.append( p )
+
+		self.livein = livein
+
+	# returns the set of registers live at the end of block i
+	def liveout( self, i, livein ):
+		live = 0
+		for j in self.graph.successors(i):
+			live |= livein[j]
+		for j in self.returnsto.get( i, () ):
+			if j < 0:
+				live |= ALL
+			else:
+				live |= livein[j]
+		return live
+
+	# returns the list of ( address, register name ) of reads of registers
+	# that may not have been written
+	def uninitialized( self ):
+		graph = self.graph
+		found = []
+		for i in range(len(graph.start)):
+			if not graph.reachable[i]:
+				continue
+			state = self.written[i]
+			for addr in range( graph.start[i], graph.end[i] ):
+				for name in names( self.uses[addr] & ~state & ~SP & ~CR ):
+					if graph.code[addr][0] not in ( simulator.CALL, simulator.RETURN ):
+						found.append( ( addr, name ) )
+				state |= self.defs[addr] | self.calledit.get( addr, 0 )
+
+		return found
+
+	# returns the set of registers live before each address
+	def liveat( self ):
+		graph = self.graph
+		result = [0] * len(graph.code)
+		for i in range(len(graph.start)):
+			live = self.liveout( i, self.livein )
+			for addr in range( graph.end[i] - 1, graph.start[i] - 1, -1 ):
+				live = self.uses[addr] | ( live & ~self.defs[addr] )
+				result[addr] = live
+
+		return result
+
+	# returns the list of ( address, register name ) of writes to a
+	# destination register whose value is never read
+	def deadwrites( self ):
+		graph = self.graph
+		found = []
+		for i in range(len(graph.start)):
+			if not graph.reachable[i]:
+				continue
+			live = self.liveout( i, self.livein )
+			for addr in range( graph.end[i] - 1, graph.start[i] - 1, -1 ):
+				for name in names( self.dest[addr] & ~live ):
+					found.append( ( addr, name ) )
+				live = self.uses[addr] | ( live & ~self.defs[addr] )
+
+		found.sort()
+		return found
+
+	# returns a dictionary from each register name to the list of
+	# ( first, last ) address ranges over which it is live
+	def liveranges( self ):
+		live = self.liveat()
+		ranges = {}
+		for r in range(len(NAMES)):
+			spans = []
+			for addr in range(len(live)):
+				if live[addr] >> r & 1:
+					if spans and spans[-1][1] == addr - 1:
+						spans[-1] = ( spans[-1][0], addr )
+					else:
+						spans.append( ( addr, addr ) )
+			ranges[ NAMES[r] ] = spans
+
+		return ranges
+
+	# returns the text of the dataflow report
+	def report( self ):
+		out = []
+		for addr, name in self.uninitialized():
+			out.append( "%02X: %s may be read before it is written" % (addr, name) )
+		for addr, name in self.deadwrites():
+			out.append( "%02X: value written to %s is never read" % (addr, name) )
+
+		out.append( "" )
+		out.append( "register  live" )
+		for name, spans in sorted( self.liveranges().items(), key=lambda item: NAMES.index( item[0] ) ):
+			out.append( "%-8s  %s" % (name, ' '.join( "%02X-%02X" % span for span in spans )) )
+
+		return "\n".join( out )
+
+
+def main( argv ):
+	if len(argv) < 2:
+		print('Usage: python %s <filename>' % (argv[0]))
+		exit()
+
+	fp = open( argv[1], 'r' )
+	tokens = assembler.tokenize( fp )
+	fp.close()
+
+	labels = assembler.pass1( tokens )
+	words = assembler.towords( assembler.pass2( tokens, labels ) )
+
+	print( Dataflow( cfg.Graph( words, labels ) ).report() )
+
+	return
@@ -0,0 +1,274 @@
+# Differential fuzz harness for the encoder
+#
+# usage: python assembler.py fuzz [<cases> [<seed>]]
+#
+# Generates random valid instruction lines and checks the words pass2
+# produces against a reference encoder written directly from the
+# instruction set definition, field by field, without the tables in isa.
+# Every 8-bit immediate is also checked against dec2comp8, and every
+# generated word must disassemble back to the instruction it came from.
+#
+# Each line is encoded on its own, so a failing case is reported as the
+# single line that produced the wrong word.
+#
+# The sources in REGRESSIONS, which once broke the analyzers, are run
+# through them first.
+#
+
+import io
+import random
+import time
+
+from . import assembler
+from . import cfg
+from . import dataflow
+from . import simulator
+from . import wcet
+
+# reference definition of the instruction set
+#
+# mnemonic : ( opcode bits, operand types )
+#
+#	B, C, D, E - register tables
+#	A - 8-bit address, L - label, I - 8-bit signed immediate
+#
+# A and I operands are generated in decimal, hex, binary and as character
+# literals.
+REFERENCE = {
+	"load":   ( "00000", "BA" ),
+	"loada":  ( "00001", "BA" ),
+	"store":  ( "00010", "BA" ),
+	"storea": ( "00011", "BA" ),
+	"bra":	  ( "00100000", "L" ),
+	"braz":   ( "00110000", "L" ),
+	"bran":   ( "00110001", "L" ),
+	"brao":   ( "00110010", "L" ),
+	"brac":   ( "00110011", "L" ),
+	"call":   ( "00110100", "L" ),
+	"return": ( "0011100000000000", "" ),
+	"halt":   ( "0011110000000000", "" ),
+	"push":   ( "0100", "C" ),
+	"pop":	  ( "0101", "C" ),
+	"oport":  ( "0110", "D" ),
+	"iport":  ( "0111", "B" ),
+	"add":	  ( "1000", "EEB" ),
+	"sub":	  ( "1001", "EEB" ),
+	"and":	  ( "1010", "EEB" ),
+	"or":	  ( "1011", "EEB" ),
+	"xor":	  ( "1100", "EEB" ),
+	"shiftl": ( "11010", "EB" ),
+	"shiftr": ( "11011", "EB" ),
+	"rotl":   ( "11100", "EB" ),
+	"rotr":   ( "11101", "EB" ),
+	"move":   ( "11110", "DB" ),
+	"movei":  ( "11111", "IB" ),
+}
+
+REGISTERS = [ "ra", "rb", "rc", "rd", "re", "sp" ]
+TABLES = { "B": REGISTERS,
+		   "C": REGISTERS + [ "pc", "cr" ],
+		   "D": REGISTERS + [ "pc", "ir" ],
+		   "E": REGISTERS + [ "0000000000000000", "1111111111111111" ] }
+
+
+# returns the reference encoding of an instruction as a 16-bit integer
+#
+# The fields follow the opcode in operand order; a destination that
+# follows a source always takes the low 3 bits, and unused bits are 0.
+def reference( instruction, labels ):
+	opcode, types = REFERENCE[ instruction[0] ]
+	bits = opcode
+
+	for i in range(len(types)):
+		t = types[i]
+		operand = instruction[i+1]
+		if t == "B" and i > 0:
+			bits = bits.ljust( 13, "0" ) + format( TABLES[t].index( operand ), '03b' )
+		elif t in TABLES:
+			bits += format( TABLES[t].index( operand ), '03b' )
+		elif t == "L":
+			bits += format( labels[ operand ], '08b' )
+		else:
+			bits += format( number( operand ) & 0xFF, '08b' )
+
+	return int( bits.ljust( 16, "0" ), 2 )
+
+
+# returns the value of a number written by randomline
+def number( text ):
+	if text.startswith("'"):
+		return ord( text[1] )
+	if text.lstrip("-").isdigit():
+		return int( text )
+	return int( text, 0 )
+
+
+# returns the text the disassembler should give for an instruction line
+# without a label operand
+def disassembly( line ):
+	text = [ line[0] ]
+	for t, operand in zip( REFERENCE[ line[0] ][1], line[1:] ):
+		if t in "AI":
+			operand = str( number( operand ) )
+		text.append( operand )
+
+	return " ".join( text )
+
+
+# returns a random number in [low, high) written in a random radix
+def randomnumber( rnd, low, high ):
+	d = rnd.randrange( low, high )
+	form = rnd.randrange(5)
+	sign = "-" if d < 0 else ""
+	if form == 0:
+		return sign + hex( abs(d) )
+	if form == 1:
+		return sign + bin( abs(d) )
+	if form == 2 and 32 < d < 127 and chr(d) not in "'\\":
+		return "'%s'" % (chr(d))
+	if form == 3:
+		return sign + "0b" + format( abs(d), '08b' )
+	return str(d)
+
+
+# returns a random valid instruction line using the given label names
+def randomline( rnd, names ):
+	name = rnd.choice( sorted(REFERENCE) )
+	line = [ name ]
+
+	for t in REFERENCE[name][1]:
+		if t in TABLES:
+			line.append( rnd.choice( TABLES[t] ) )
+		elif t == "L":
+			line.append( rnd.choice( names ) )
+		elif t == "A":
+			line.append( randomnumber( rnd, 0, 256 ) )
+		else:
+			line.append( randomnumber( rnd, -128, 128 ) )
+
+	return line
+
+
+# sources that once broke the analyzers: ( mode, source, a line the
+# report must hold )
+REGRESSIONS = [
+	( "wcet", "call tail\nhalt\ntail:\n", "call to 02 outside the program" ),
+	( "dataflow", "call g\noport rc\nhalt\ng:\nbraz skip\nmovei 2 rc\nskip:\nreturn\n",
+	  "01: rc may be read before it is written" ),
+]
+
+
+# returns the report of the analyzer of a mode, wcet or dataflow, for a
+# source text
+def analyze( mode, source ):
+	tokens = assembler.tokenize( io.StringIO( source ) )
+	labels = assembler.pass1( tokens )
+	graph = cfg.Graph( assembler.towords( assembler.pass2( tokens, labels ) ), labels )
+
+	if mode == "wcet":
+		return "\n".join( str( v ) for entry, v in sorted( wcet.Estimator( graph ).estimate().items() ) )
+	return dataflow.Dataflow( graph ).report()
+
+
+# runs the regression sources and returns the list of ( mode, source,
+# report ) of those whose report lacks the expected line
+def checkregressions():
+	failures = []
+	for mode, source, expected in REGRESSIONS:
+		try:
+			report = analyze( mode, source )
+		except Exception as e:
+			report = "%s: %s" % (type( e ).__name__, e)
+		if expected not in report.split( "\n" ):
+			failures.append( ( mode, source, report ) )
+
+	return failures
+
+
+# returns the list of ( line, expected, actual ) for the lines whose
+# encoding differs from the reference; actual is None if pass2 failed
+def check( lines, labels ):
+	failures = []
+
+	for line in lines:
+		expected = reference( line, labels )
+		try:
+			actual = int( assembler.pass2( [line], labels )[0], 2 )
+		except SystemExit:
+			actual = None
+
+		if actual != expected:
+			failures.append( ( line, expected, actual ) )
+		elif "L" not in REFERENCE[ line[0] ][1]:
+			if simulator.disassemble( actual ) != disassembly( line ):
+				failures.append( ( line, expected, actual ) )
+
+	return failures
+
+
+# checks dec2comp8 for every value an 8-bit immediate can hold
+def checkimmediates():
+	failures = []
+	for d in range(-128, 128):
+		try:
+			v = assembler.dec2comp8( d, 0 )
+		except SystemExit:
+			v = None
+		if v != format( d & 0xFF, '08b' ):
+			failures.append( ( d, v ) )
+
+	return failures
+
+
+# runs n random cases and returns the list of failures
+def fuzz( n, seed=1, batch=1000 ):
+	rnd = random.Random( seed )
+	failures = []
+
+	done = 0
+	while done < n:
+		names = [ "l%d" % (i) for i in range(8) ]
+		labels = dict( ( name, rnd.randrange(256) ) for name in names )
+
+		# encode every line afresh rather than from the memo of earlier runs
+		assembler.encoded.clear()
+
+		size = min( batch, n - done )
+		failures.extend( check( [ randomline( rnd, names ) for i in range(size) ], labels ) )
+		done += size
+
+	return failures
+
+
+def main( argv ):
+	n = 100000
+	seed = 1
+	if len(argv) > 1:
+		n = int(argv[1])
+	if len(argv) > 2:
+		seed = int(argv[2])
+
+	broken = checkregressions()
+	for mode, source, report in broken:
+		print('%s regression on %r: %s' % (mode, source, report))
+
+	bad = checkimmediates()
+	for d, v in bad:
+		print('dec2comp8(%d) = %s, expected %s' % (d, v, format( d & 0xFF, '08b' )))
+
+	t0 = time.perf_counter()
+	failures = fuzz( n, seed )
+	t = time.perf_counter() - t0
+
+	for line, expected, actual in failures[:20]:
+		if actual is None:
+			actual = "error"
+		else:
+			actual = format( actual, '016b' )
+		print('%-40s expected %s got %s' % (' '.join(line), format( expected, '016b' ), actual))
+
+	print('%d cases, %d failures, %.0f cases per second' % (n, len(failures), n / t))
+	if broken or bad or failures:
+		exit(1)
+
+	return
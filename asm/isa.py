@@ -0,0 +1,130 @@
+# Instruction set tables
+#
+# The tables are built once, when the module is imported, and are shared
+# by the assembler and the simulator.
+#
+# Operand tables:
+#
+#	B - destinations:	RA RB RC RD RE SP
+#	C - stack operands: RA RB RC RD RE SP PC CR
+#	D - sources:		RA RB RC RD RE SP PC IR
+#	E - ALU sources:	RA RB RC RD RE SP, all zeros, all ones
+#
+# Table E also accepts ZEROS and ONES for the two constants.
+#
+
+TABLEB = [ "ra", "rb", "rc", "rd", "re", "sp" ]
+TABLEC = TABLEB + [ "pc", "cr" ]
+TABLED = TABLEB + [ "pc", "ir" ]
+TABLEE = TABLEB + [ "0000000000000000", "1111111111111111" ]
+
+
+# returns a dictionary from the operand names of a table to their codes
+def codes( table ):
+	result = {}
+	for i in range(len(table)):
+		result[ table[i] ] = format( i, '03b' )
+
+	return result
+
+
+B = codes( TABLEB )
+C = codes( TABLEC )
+D = codes( TABLED )
+E = codes( TABLEE )
+E["zeros"] = E["0000000000000000"]
+E["ones"] = E["1111111111111111"]
+
+# version of the encoding; bump it whenever the words an instruction
+# assembles to change, so the linker's object cache is not used
+VERSION = 2
+
+# operand kinds of the instruction formats that are not register tables
+ADDRESS = "address"			# an 8-bit address
+LABEL = "label"				# a label, encoded as its 8-bit address
+IMMEDIATE = "immediate"		# an 8-bit two's complement value
+
+# instruction formats
+#
+# mnemonic : ( error message for missing operands, fields )
+#
+# Each field is either a string of bits or a tuple ( kind, operand
+# index ) where kind is an operand table or one of the kinds above.
+FORMATS = {
+	"load":   ( "LOAD error: provide a destination & an address",
+				[ "00000", (B, 1), (ADDRESS, 2) ] ),
+	"loada":  ( "LOADA error: provide a destination & an address",
+				[ "00001", (B, 1), (ADDRESS, 2) ] ),
+	"store":  ( "STORE error: provide a source & an address",
+				[ "00010", (B, 1), (ADDRESS, 2) ] ),
+	"storea": ( "STOREA error: provide a source & an address",
+				[ "00011", (B, 1), (ADDRESS, 2) ] ),
+	"bra":	  ( "BRANCH error: provide a label to branch to",
+				[ "00100000", (LABEL, 1) ] ),
+	"braz":   ( "BRANCH error: provide a label to branch to",
+				[ "00110000", (LABEL, 1) ] ),
+	"bran":   ( "BRANCH error: provide a label to branch to",
+				[ "00110001", (LABEL, 1) ] ),
+	"brao":   ( "BRANCH error: provide a label to branch to",
+				[ "00110010", (LABEL, 1) ] ),
+	"brac":   ( "BRANCH error: provide a label to branch to",
+				[ "00110011", (LABEL, 1) ] ),
+	"call":   ( "CALL error: provide a label to call",
+				[ "00110100", (LABEL, 1) ] ),
+	"return": ( "", [ "0011100000000000" ] ),
+	"halt":   ( "", [ "0011110000000000" ] ),
+	"push":   ( "PUSH error: provide a source to push onto the stack",
+				[ "0100", (C, 1), "000000000" ] ),
+	"pop":	  ( "POP error: provide a source to pop from the stack",
+				[ "0101", (C, 1), "000000000" ] ),
+	"oport":  ( "OPORT error: provide a source to send to the output port",
+				[ "0110", (D, 1), "000000000" ] ),
+	"iport":  ( "IPORT error: provide a destination to receive the value of the input port",
+				[ "0111", (B, 1), "000000000" ] ),
+	"add":	  ( "ADD error: provide two sources and a destination",
+				[ "1000", (E, 1), (E, 2), "000", (B, 3) ] ),
+	"sub":	  ( "SUB error: provide two sources and a destination",
+				[ "1001", (E, 1), (E, 2), "000", (B, 3) ] ),
+	"and":	  ( "AND error: provide two sources and a destination",
+				[ "1010", (E, 1), (E, 2), "000", (B, 3) ] ),
+	"or":	  ( "OR error: provide two sources and a destination",
+				[ "1011", (E, 1), (E, 2), "000", (B, 3) ] ),
+	"xor":	  ( "XOR error: provide two sources and a destination",
+				[ "1100", (E, 1), (E, 2), "000", (B, 3) ] ),
+	"shiftl": ( "SHIFTL error: provide a source and a destination",
+				[ "11010", (E, 1), "00000", (B, 2) ] ),
+	"shiftr": ( "SHIFTR error: provide a source and a destination",
+				[ "11011", (E, 1), "00000", (B, 2) ] ),
+	"rotl":   ( "ROTL error: provide a source and a destination",
+				[ "11100", (E, 1), "00000", (B, 2) ] ),
+	"rotr":   ( "ROTR error: provide a source and a destination",
+				[ "11101", (E, 1), "00000", (B, 2) ] ),
+	"move":   ( "MOVE error: provide a source and a destination",
+				[ "11110", (D, 1), "00000", (B, 2) ] ),
+	"movei":  ( "MOVEI error: provide a source and a destination",
+				[ "11111", (IMMEDIATE, 1), (B, 2) ] ),
+}
+
+# number of tokens, mnemonic included, each instruction needs
+LENGTHS = dict( ( name, 1 + len( [ f for f in FORMATS[name][1] if not isinstance(f, str) ] ) )
+				for name in FORMATS )
+
+# the mnemonics that take a label operand
+BRANCHES = ( "bra", "braz", "bran", "brao", "brac", "call" )
+
+# mnemonic : { operand index : kind } for the operands that are not
+# registers
+FIELDS = dict( ( name, dict( f[::-1] for f in FORMATS[name][1]
+							 if not isinstance(f, str) and not isinstance(f[0], dict) ) )
+			   for name in FORMATS )
+
+# mnemonic : indexes of the operands that are numbers, parsed by the
+# tokenizer
+NUMERIC = dict( ( name, sorted( i for i in FIELDS[name] if FIELDS[name][i] != LABEL ) )
+				for name in FORMATS if FIELDS[name] )
+
+# mnemonic : indexes of the operands that may refer to a label
+SYMBOLIC = dict( ( name, sorted( FIELDS[name] ) ) for name in FORMATS if FIELDS[name] )
+
+# bit position of the low bit of each kind of numeric or label field
+SHIFTS = { ADDRESS: 0, LABEL: 0, IMMEDIATE: 3 }
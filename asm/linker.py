@@ -0,0 +1,228 @@
+# Relocatable object files and a linker for separately assembled modules
+#
+# - A module may export labels with a line of the form
+#
+#	.global NAME
+#
+# - and may refer to labels defined in other modules by declaring them
+#
+#	.extern NAME
+#
+# - An object file holds the encoded words of one module, the labels it
+# - exports (relative to the start of the module), the symbols it imports
+# - and a relocation entry for every field that holds a label address.
+#
+# - Relocation entries are [ address, kind, shift, ... ], where shift is
+# - the position of the low bit of the 8-bit field in the word:
+#	[ addr, "abs", shift ] - the field holds a module relative address;
+#							 add the base
+#	[ addr, "sym", shift, name, offset ] - the field must be filled with
+#							 the address of a symbol plus offset
+#
+# - Object files are stored as canonical JSON, so the sha256 of the file
+# - contents identifies the object.  Assembled sources are cached by the
+# - sha256 of their text, the object format and isa.VERSION, so a shared
+# - routine library is assembled once and linked many times.  Objects are
+# - written to a temporary file and renamed into place, so builds running
+# - at the same time never read a partly written object.
+#
+
+import hashlib
+import json
+import os
+
+from . import assembler
+from . import isa
+
+FORMAT = "obj2"
+
+
+# assembles the module in fp and returns it as an object dictionary
+def assemble( fp ):
+	tokens = assembler.tokenize( fp )
+	labels = assembler.pass1( tokens )
+
+	exports = []
+	imports = []
+	for line in tokens:
+		if line[0] == ".global":
+			exports.extend( line[1:] )
+		elif line[0] == ".extern":
+			imports.extend( line[1:] )
+
+	if assembler.data( tokens, labels )[1]:
+		print('Data directives cannot be used in a linked module')
+		exit()
+
+	for name in exports:
+		if name not in labels:
+			print('Exported label is not defined: %s' % (name))
+			exit()
+
+	# imported symbols are encoded as address 0, without their offsets, and
+	# patched by the linker, which checks the range of symbol + offset
+	resolved = dict( labels )
+	for name in imports:
+		resolved.setdefault( name, 0 )
+
+	placeholders = []
+	for line in tokens:
+		placeholders.append( [ ( word[0], 0 ) if isinstance( word, tuple ) and word[0] not in labels else word
+							   for word in line ] )
+
+	words = assembler.towords( assembler.pass2( placeholders, resolved ) )
+
+	relocs = []
+	for addr, line in enumerate( assembler.program( tokens ) ):
+		for i, name, offset in assembler.symbolic( line ) or ():
+			shift = isa.SHIFTS[ isa.FIELDS[ line[0] ][i] ]
+			if name in labels:
+				relocs.append( [addr, "abs", shift] )
+			else:
+				relocs.append( [addr, "sym", shift, name, offset] )
+
+	return { "format": FORMAT,
+			 "words": words,
+			 "exports": dict( (name, labels[name]) for name in exports ),
+			 "imports": sorted( set(imports) ),
+			 "relocs": relocs }
+
+
+# returns the canonical bytes of an object
+def dumps( obj ):
+	return json.dumps( obj, sort_keys=True, separators=(',', ':') ).encode( 'utf-8' )
+
+
+# returns the content hash identifying an object
+def objecthash( obj ):
+	return hashlib.sha256( dumps(obj) ).hexdigest()
+
+
+# writes an object to a temporary file next to filename, named after the
+# process, and renames it into place
+def saveobject( obj, filename ):
+	temp = "%s.%d.tmp" % (filename, os.getpid())
+	try:
+		fp = open( temp, 'wb' )
+		fp.write( dumps(obj) )
+		fp.close()
+		os.replace( temp, filename )
+	except BaseException:
+		if os.path.exists( temp ):
+			os.remove( temp )
+		raise
+
+
+def loadobject( filename ):
+	fp = open( filename, 'rb' )
+	obj = json.loads( fp.read().decode('utf-8') )
+	fp.close()
+
+	if obj.get("format") != FORMAT:
+		print('%s is not an object file' % (filename))
+		exit()
+
+	return obj
+
+
+# returns the object for a source file, reusing the cached object when the
+# source text has been assembled before
+def cachedobject( filename, cachedir ):
+	fp = open( filename, 'rb' )
+	version = "%s %d\n" % (FORMAT, isa.VERSION)
+	key = hashlib.sha256( version.encode('utf-8') + fp.read() ).hexdigest()
+	fp.close()
+
+	path = os.path.join( cachedir, key + ".obj" )
+	if os.path.exists( path ):
+		return loadobject( path )
+
+	fp = open( filename, 'r' )
+	obj = assemble( fp )
+	fp.close()
+
+	os.makedirs( cachedir, exist_ok=True )
+	saveobject( obj, path )
+
+	return obj
+
+
+# places the objects one after another, starting at address 0, and
+# returns the linked program as a list of words
+def link( objects ):
+	bases = []
+	symbols = {}
+	base = 0
+
+	for obj in objects:
+		bases.append( base )
+		for name, addr in obj["exports"].items():
+			if name in symbols:
+				print('Duplicate symbol: %s' % (name))
+				exit()
+			symbols[name] = base + addr
+		base += len( obj["words"] )
+
+	if base > 256:
+		print('Linked program too large: %d words' % (base))
+		exit()
+
+	words = []
+	for obj, base in zip( objects, bases ):
+		code = list( obj["words"] )
+
+		for reloc in obj["relocs"]:
+			shift = reloc[2]
+			field = (code[reloc[0]] >> shift) & 0xFF
+			if reloc[1] == "abs":
+				if shift:
+					field -= (field & 0x80) << 1
+				addr = field + base
+			else:
+				if reloc[3] not in symbols:
+					print('Undefined symbol: %s' % (reloc[3]))
+					exit()
+				addr = symbols[reloc[3]] + reloc[4]
+
+			# immediates are signed, addresses are not
+			if addr < -128 * (shift > 0) or addr > 255 - 128 * (shift > 0):
+				print('Relocated value out of range: %d' % (addr))
+				exit()
+			code[reloc[0]] = (code[reloc[0]] & ~(0xFF << shift)) | ((addr & 0xFF) << shift)
+
+		words.extend( code )
+
+	return words
+
+
+def main( argv ):
+	if len(argv) == 4 and argv[1] == "-c":
+		fp = open( argv[2], 'r' )
+		obj = assemble( fp )
+		fp.close()
+		saveobject( obj, argv[3] )
+		print('%s %s' % (objecthash(obj), argv[3]))
+		return
+
+	if len(argv) < 3:
+		print('Usage: python %s <output.mif> <module> [<module> ...]' % (argv[0]))
+		print('	   python %s -c <source> <output.obj>' % (argv[0]))
+		print('	modules are assembly sources or .obj files')
+		exit()
+
+	cachedir = os.environ.get( "ASM_OBJCACHE", ".objcache" )
+
+	objects = []
+	for filename in argv[2:]:
+		if filename.endswith(".obj"):
+			objects.append( loadobject(filename) )
+		else:
+			objects.append( cachedobject(filename, cachedir) )
+
+	text = assembler.mif( argv[1], link(objects) )
+
+	fp = open( argv[1], 'w' )
+	fp.write( text )
+	fp.close()
+
+	return
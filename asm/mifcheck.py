@@ -0,0 +1,250 @@
+# Equivalence checker for memory initialization files
+#
+# usage: python assembler.py mifcheck <expected.mif> <actual.mif>
+#		 python assembler.py mifcheck <expected dir> <actual dir>
+#		 python assembler.py mifcheck <dir>
+#
+# Compares MIF images word by word and lists every differing word with
+# both values disassembled.  Given two directories, each .mif file of the
+# first is compared with the file of the same name in the second.  Given
+# one directory, each .mif file that has a .txt source next to it is a
+# golden image, compared with the freshly assembled source.  The pairs
+# are checked on a pool of worker processes.
+#
+# The MIF reader accepts:
+#
+# - DEPTH, WIDTH (at most 16), ADDRESS_RADIX and DATA_RADIX of HEX, BIN,
+# - OCT, DEC or UNS
+# - -- comments and % block comments %
+# - single addresses with one or more values and [a..b] ranges, whose
+# - values repeat to fill the range
+# - text after the last ; of a line that is not an entry, such as the
+# - repeated values in test.mif, which is ignored
+#
+# Words not given in the file are 0.
+#
+
+import array
+import multiprocessing
+import os
+import re
+
+from . import assembler
+from . import simulator
+
+RADIXES = { "hex": 16, "bin": 2, "oct": 8, "dec": 10, "uns": 10 }
+
+HEADER = re.compile( r"^\s*(\w+)\s*=\s*(\w+)\s*$" )
+CONTENT = re.compile( r"\bCONTENT\b", re.I )
+RANGE = re.compile( r"^\[\s*(\w+)\s*\.\.\s*(\w+)\s*\]$" )
+
+
+class MIFError( Exception ):
+	pass
+
+
+# returns the text with the -- and % % comments removed
+def uncomment( text ):
+	text = re.sub( r"%[^%]*%", " ", text )
+	return re.sub( r"--[^\n]*", "", text )
+
+
+# parses the text of a MIF file and returns its words as an array('H')
+# of DEPTH words
+def parse( text ):
+	settings = { "depth": "256", "width": "16", "address_radix": "hex", "data_radix": "hex" }
+
+	text = uncomment( text )
+	m = CONTENT.search( text )
+	if m is None:
+		raise MIFError( 'no CONTENT section' )
+
+	for statement in text[ :m.start() ].split( ";" ):
+		if statement.strip():
+			setting = HEADER.match( statement )
+			if setting is None:
+				raise MIFError( 'unexpected header line: %s' % (statement.strip()) )
+			settings[ setting.group(1).lower() ] = setting.group(2).lower()
+
+	try:
+		depth = int( settings["depth"] )
+		width = int( settings["width"] )
+		aradix = RADIXES[ settings["address_radix"] ]
+		dradix = RADIXES[ settings["data_radix"] ]
+	except ( KeyError, ValueError ):
+		raise MIFError( 'invalid header' )
+	if width > 16:
+		raise MIFError( 'words wider than 16 bits' )
+
+	words = array.array( 'H', [0] ) * depth
+	pending = ""
+	for line in text[ m.end(): ].split( "\n" ):
+		pending += " " + line.strip()
+		while ";" in pending:
+			entry, pending = pending.split( ";", 1 )
+			entry = entry.strip()
+			if entry.upper() in ( "BEGIN", "END" ) or entry.upper().startswith( "BEGIN " ):
+				entry = entry[5:].strip()
+			if ":" in entry:
+				store( words, entry, aradix, dradix, width )
+
+		# text after the last ; that is not an entry
+		if ":" not in pending:
+			pending = ""
+
+	return words
+
+
+# stores the values of one address : values entry
+def store( words, entry, aradix, dradix, width ):
+	where, values = entry.split( ":", 1 )
+	where = where.strip()
+
+	try:
+		m = RANGE.match( where )
+		if m:
+			first = int( m.group(1), aradix )
+			last = int( m.group(2), aradix )
+		else:
+			first = int( where, aradix )
+			last = None
+		values = [ int( v, dradix ) for v in values.split() ]
+	except ValueError:
+		raise MIFError( 'invalid entry: %s' % (entry) )
+
+	if not values:
+		raise MIFError( 'entry without a value: %s' % (entry) )
+	if last is None:
+		last = first + len(values) - 1
+	if first > last or last >= len(words):
+		raise MIFError( 'address out of range: %s' % (entry) )
+
+	for addr in range( first, last + 1 ):
+		v = values[ (addr - first) % len(values) ]
+		if v >> width:
+			raise MIFError( 'value wider than %d bits: %s' % (width, entry) )
+		words[addr] = v
+
+
+# returns the list of ( address, expected, actual ) of the words that
+# differ; a word missing from the shorter image counts as None
+def diff( expected, actual ):
+	found = []
+	for addr in range( max( len(expected), len(actual) ) ):
+		e = expected[addr] if addr < len(expected) else None
+		a = actual[addr] if addr < len(actual) else None
+		if e != a:
+			found.append( ( addr, e, a ) )
+
+	return found
+
+
+# returns the text describing one differing word
+def describe( addr, expected, actual ):
+	def show( v ):
+		if v is None:
+			return "%-16s  %-20s" % ("missing", "")
+		return "%s  %-20s" % (format( v, '016b' ), simulator.disassemble( v ))
+
+	return "%02X: expected %s  got %s" % (addr, show( expected ), show( actual ))
+
+
+# returns the words of a MIF file
+def load( filename ):
+	fp = open( filename, 'r' )
+	text = fp.read()
+	fp.close()
+
+	return parse( text )
+
+
+# returns the words of a MIF file as the assembler would write it for the
+# source file
+def assemble( filename ):
+	fp = open( filename, 'r' )
+	tokens = assembler.tokenize( fp )
+	fp.close()
+
+	words = assembler.towords( assembler.pass2( tokens, assembler.pass1( tokens ) ) )
+	return parse( assembler.mif( filename, words ) )
+
+
+# compares one pair; actual is a .mif file or a source to assemble, and
+# returns ( expected, actual, list of differences or an error message )
+def check( pair ):
+	expected, actual = pair
+	try:
+		golden = load( expected )
+		if actual.endswith(".mif"):
+			fresh = load( actual )
+		else:
+			fresh = assemble( actual )
+	except ( MIFError, IOError ) as e:
+		return ( expected, actual, str(e) )
+	except SystemExit:
+		return ( expected, actual, "assembly failed" )
+
+	return ( expected, actual, diff( golden, fresh ) )
+
+
+# checks the pairs on a pool of worker processes and returns the results
+# in the same order
+def checkall( pairs, workers=None ):
+	if workers is None:
+		workers = multiprocessing.cpu_count()
+
+	if workers <= 1 or len(pairs) < 2:
+		return [ check( pair ) for pair in pairs ]
+
+	pool = multiprocessing.Pool( workers )
+	try:
+		results = pool.map( check, pairs )
+	finally:
+		pool.close()
+		pool.join()
+
+	return results
+
+
+# returns the ( expected, actual ) pairs to check for the arguments
+def pairs( args ):
+	if len(args) == 1:
+		found = []
+		for name in sorted( os.listdir( args[0] ) ):
+			stem, ext = os.path.splitext( name )
+			source = os.path.join( args[0], stem + ".txt" )
+			if ext == ".mif" and os.path.exists( source ):
+				found.append( ( os.path.join( args[0], name ), source ) )
+		return found
+
+	if os.path.isdir( args[0] ):
+		return [ ( os.path.join( args[0], name ), os.path.join( args[1], name ) )
+				 for name in sorted( os.listdir( args[0] ) ) if name.endswith(".mif") ]
+
+	return [ ( args[0], args[1] ) ]
+
+
+def main( argv ):
+	if len(argv) < 2:
+		print('Usage: python %s <expected.mif> <actual.mif>' % (argv[0]))
+		print('	   python %s <expected dir> <actual dir>' % (argv[0]))
+		print('	   python %s <dir>' % (argv[0]))
+		exit()
+
+	failed = 0
+	results = checkall( pairs( argv[1:3] ) )
+	for expected, actual, found in results:
+		if isinstance( found, str ):
+			failed += 1
+			print('%s: %s' % (actual, found))
+		elif found:
+			failed += 1
+			print('%s differs from %s in %d words' % (actual, expected, len(found)))
+			for addr, e, a in found:
+				print('	' + describe( addr, e, a ))
+
+	print('%d checked, %d differ' % (len(results), failed))
+	if failed:
+		exit(1)
+
+	return
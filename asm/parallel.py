@@ -0,0 +1,74 @@
+# Parallel pass 2 for very large sources
+#
+# Once pass 1 has fixed the label addresses, the encoding of each
+# instruction depends only on the instruction and the label table.  The
+# instruction lines are split into chunks, each chunk is encoded by a
+# worker process holding a copy of the frozen label table, and the
+# results are concatenated in order.
+#
+# This is only used by bench.  The program memory holds 256 words, so
+# mif() rejects anything larger, and a program that fits is well below
+# one chunk, which pass2parallel encodes directly; the assembler itself
+# therefore has no option to run it.
+#
+
+import multiprocessing
+
+from . import assembler
+
+# label table of a worker process, set once by the pool initializer
+_labels = None
+
+
+def _initworker( labels ):
+	global _labels
+	_labels = labels
+
+
+# pass2 reports errors by exiting, which would leave the pool waiting for
+# a result that never comes, so an error is passed back as None
+def _encodechunk( chunk ):
+	try:
+		return assembler.pass2( chunk, _labels )
+	except SystemExit:
+		return None
+
+
+# splits lines into consecutive chunks of at most size lines
+def chunks( lines, size ):
+	return [ lines[i:i+size] for i in range(0, len(lines), size) ]
+
+
+# encodes the tokens like pass2, using a pool of worker processes; with
+# one worker, or a program smaller than one chunk, pass2 is run directly
+def pass2parallel( tokens, labels, workers=None, chunksize=2048 ):
+	if workers is None:
+		workers = multiprocessing.cpu_count()
+
+	lines = assembler.program( tokens )
+	if workers <= 1 or len(lines) <= chunksize:
+		return assembler.pass2( lines, labels )
+
+	return pass2pool( lines, labels, workers, chunksize )
+
+
+# encodes the instruction lines on a pool of worker processes, however
+# few workers or lines there are
+def pass2pool( lines, labels, workers, chunksize=2048 ):
+	# give every worker a few chunks so a slow chunk does not stall the pool
+	size = min( chunksize, max( 1, len(lines) // (workers * 4) ) )
+
+	pool = multiprocessing.Pool( workers, _initworker, (dict(labels),) )
+	try:
+		results = pool.map( _encodechunk, chunks( lines, size ) )
+	finally:
+		pool.close()
+		pool.join()
+
+	binaryinstructions = []
+	for result in results:
+		if result is None:
+			exit()
+		binaryinstructions.extend( result )
+
+	return binaryinstructions
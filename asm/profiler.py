@@ -0,0 +1,122 @@
+# Execution profiler for the simulator
+#
+# usage: python assembler.py profile <filename> [<input> ...]
+#
+# Runs the program in the simulator and reports, mapped back to the
+# source lines:
+#
+# - the number of times each location was executed and the cycles spent
+# - the cycles spent in each label region (from a label to the next one)
+# - how often each conditional branch was taken
+# - the stack depth high-water mark, counting the PC and CR pushed by CALL
+#
+# The counters are arrays indexed by address and are updated inline by
+# the simulator's run loop, so profiling adds little to the run time.
+#
+
+import array
+
+from . import assembler
+from . import simulator
+
+
+class Profile:
+
+	def __init__( self, size=256 ):
+		self.counts = array.array( 'L', [0] ) * size
+		self.taken = array.array( 'L', [0] ) * size
+		self.maxdepth = 0
+		self.sp0 = None
+
+	# returns the cycles spent at each address
+	def cycles( self, costs ):
+		return [ count * cost for count, cost in zip( self.counts, costs ) ]
+
+	# returns a list of ( label, start address, cycles ) for each label
+	# region; code before the first label is in the region ""
+	def regions( self, costs, labels ):
+		spent = self.cycles( costs )
+		starts = sorted( ( addr, name ) for name, addr in assembler.codelabels( labels ) )
+		if not starts or starts[0][0] > 0:
+			starts.insert( 0, ( 0, "" ) )
+
+		result = []
+		for i in range(len(starts)):
+			addr, name = starts[i]
+			end = len(spent)
+			if i + 1 < len(starts):
+				end = starts[i+1][0]
+			result.append( ( name, addr, sum( spent[addr:end] ) ) )
+
+		return result
+
+	# returns the text of the profile report
+	#
+	# lines and source give the source line number and text of each address
+	def report( self, words, costs, labels, lines=None, source=None ):
+		out = []
+		spent = self.cycles( costs )
+		total = sum( spent )
+
+		out.append( "addr     count    cycles  line  instruction" )
+		for addr in range(len(words)):
+			if self.counts[addr] == 0:
+				continue
+			text = simulator.disassemble( words[addr] )
+			linenum = ""
+			if lines is not None and addr < len(lines):
+				linenum = lines[addr]
+				if source is not None:
+					text = source[ linenum - 1 ].strip()
+			out.append( "%02X  %9d %9d  %4s  %s" % (addr, self.counts[addr], spent[addr], linenum, text) )
+
+		out.append( "" )
+		out.append( "region            cycles      %" )
+		for name, addr, cycles in self.regions( costs, labels ):
+			share = 0.0
+			if total:
+				share = 100.0 * cycles / total
+			out.append( "%-12s %11d %6.1f" % (name or "(start)", cycles, share) )
+
+		out.append( "" )
+		out.append( "branch      taken  executed  ratio" )
+		for addr in range(len(words)):
+			if self.counts[addr] == 0:
+				continue
+			if simulator.decode( words[addr] )[0] != simulator.BRC:
+				continue
+			out.append( "%02X     %9d %9d  %5.2f" % (addr, self.taken[addr], self.counts[addr],
+												   float( self.taken[addr] ) / self.counts[addr]) )
+
+		out.append( "" )
+		out.append( "stack high-water mark: %d words" % (self.maxdepth) )
+
+		return "\n".join( out )
+
+
+def main( argv ):
+	if len(argv) < 2:
+		print('Usage: python %s <filename> [<input> ...]' % (argv[0]))
+		exit()
+
+	fp = open( argv[1], 'r' )
+	linenums = []
+	tokens = assembler.tokenize( fp, linenums )
+	fp.seek( 0 )
+	source = fp.readlines()
+	fp.close()
+
+	labels = assembler.pass1( tokens )
+	words = assembler.towords( assembler.pass2( tokens, labels ) )
+	image, size = assembler.data( tokens, labels )
+
+	sim = simulator.Simulator( words, [ int(v) for v in argv[2:] ], data=image[:size] )
+	profile = Profile()
+	status = sim.run( profile=profile )
+
+	print('%s after %d instructions, %d cycles' % (status, sim.steps, sim.cycles))
+	print('')
+	print( profile.report( words, sim.costs, labels,
+						   assembler.addresslines( tokens, linenums ), source ) )
+
+	return
@@ -0,0 +1,485 @@
+# Instruction set simulator for the words produced by pass2
+#
+# The machine has six registers (RA RB RC RD RE SP), an 8-bit program
+# counter, the instruction register IR, a 4-bit condition register CR,
+# 256 words of program memory and 256 words of data memory.  The stack
+# lives in data memory and grows upwards from SP.
+#
+# CR bit n holds the condition tested by the branch with condition code n:
+#
+#	bit 0 - zero		BRAZ
+#	bit 1 - negative	BRAN
+#	bit 2 - overflow	BRAO
+#	bit 3 - carry		BRAC
+#
+# CALL pushes PC and then CR; RETURN pops CR and then PC.  Only the
+# arithmetic, logic, shift and rotate instructions change CR.
+#
+# A snapshot of the machine is a SNAPSHOT byte blob:
+#
+#	header	 - PC, CR, IR, status, input position, instructions executed,
+#			   cycles and output count (see HEADER)
+#	registers - RA RB RC RD RE SP as 6 16-bit words
+#	memory	 - the 256 words of data memory, stack included
+#
+# The words are stored in the byte order of the machine.  Output values
+# produced before a snapshot are not part of it.
+#
+
+import array
+import struct
+
+from . import assembler
+from . import isa
+
+# operation codes of decoded instructions
+( LOAD, LOADA, STORE, STOREA, BRA, BRC, CALL, RETURN, HALT, PUSH, POP,
+  OPORT, IPORT, ADD, SUB, AND, OR, XOR, SHIFTL, SHIFTR, ROTL, ROTR, MOVE,
+  MOVEI, INVALID ) = range(25)
+
+MNEMONICS = [ "load", "loada", "store", "storea", "bra", "br", "call",
+			  "return", "halt", "push", "pop", "oport", "iport", "add", "sub",
+			  "and", "or", "xor", "shiftl", "shiftr", "rotl", "rotr", "move",
+			  "movei", "invalid" ]
+
+BRANCHES = [ "braz", "bran", "brao", "brac" ]
+
+# operand names of tables B, C, D and E
+TABLEB = isa.TABLEB
+TABLEC = isa.TABLEC
+TABLED = isa.TABLED
+TABLEE = isa.TABLEE
+
+STATUSES = [ "ready", "steps", "halt", "invalid" ]
+
+HEADER = struct.Struct( '<BBHBIQQI' )
+REGISTERS = HEADER.size
+MEMORY = REGISTERS + 6 * 2
+SNAPSHOT = MEMORY + 256 * 2
+
+# cycles taken by each instruction
+CYCLES = { "load": 5, "loada": 5, "store": 5, "storea": 5,
+		   "bra": 4, "braz": 4, "bran": 4, "brao": 4, "brac": 4,
+		   "call": 6, "return": 7, "halt": 3,
+		   "push": 5, "pop": 5, "oport": 4, "iport": 4,
+		   "add": 4, "sub": 4, "and": 4, "or": 4, "xor": 4,
+		   "shiftl": 4, "shiftr": 4, "rotl": 4, "rotr": 4,
+		   "move": 4, "movei": 4 }
+
+
+# decodes a 16-bit word into a tuple ( op, a, b, c )
+#
+# memory ops:	a = register, b = address
+# branches:		a = condition code, b = address
+# stack/ports:	a = register
+# ALU ops:		a, b = sources, c = destination
+# MOVEI:		b = immediate, c = destination
+def decode( word ):
+	top = word >> 12
+	c = word & 7
+
+	if top < 2:
+		op = ( LOAD, LOADA, STORE, STOREA )[ word >> 11 ]
+		reg = (word >> 8) & 7
+		if reg > 5:
+			return ( INVALID, 0, 0, 0 )
+		return ( op, reg, word & 0xFF, 0 )
+
+	if top == 2:
+		return ( BRA, 0, word & 0xFF, 0 )
+
+	if top == 3:
+		kind = (word >> 10) & 3
+		if kind == 0:
+			return ( BRC, (word >> 8) & 3, word & 0xFF, 0 )
+		return ( ( CALL, RETURN, HALT )[ kind - 1 ], 0, word & 0xFF, 0 )
+
+	if top < 8:
+		reg = (word >> 9) & 7
+		if top == 7 and reg > 5:
+			return ( INVALID, 0, 0, 0 )
+		return ( ( PUSH, POP, OPORT, IPORT )[ top - 4 ], reg, 0, 0 )
+
+	if c > 5:
+		return ( INVALID, 0, 0, 0 )
+
+	if top < 13:
+		return ( ( ADD, SUB, AND, OR, XOR )[ top - 8 ], (word >> 9) & 7, (word >> 6) & 7, c )
+
+	right = (word >> 11) & 1
+	if top == 13:
+		return ( ( SHIFTL, SHIFTR )[ right ], (word >> 8) & 7, 0, c )
+	if top == 14:
+		return ( ( ROTL, ROTR )[ right ], (word >> 8) & 7, 0, c )
+
+	if right:
+		imm = (word >> 3) & 0xFF
+		if imm > 127:
+			imm -= 256
+		return ( MOVEI, 0, imm, c )
+
+	return ( MOVE, (word >> 8) & 7, 0, c )
+
+
+# returns the mnemonic of a decoded instruction
+def mnemonic( inst ):
+	if inst[0] == BRC:
+		return BRANCHES[ inst[1] ]
+	return MNEMONICS[ inst[0] ]
+
+
+# returns the assembly text of a word
+def disassemble( word ):
+	inst = decode( word )
+	op, a, b, c = inst
+	name = mnemonic( inst )
+
+	if op <= STOREA:
+		return "%s %s %d" % (name, TABLEB[a], b)
+	if op <= CALL:
+		return "%s %d" % (name, b)
+	if op <= HALT:
+		return name
+	if op == PUSH or op == POP:
+		return "%s %s" % (name, TABLEC[a])
+	if op == OPORT:
+		return "%s %s" % (name, TABLED[a])
+	if op == IPORT:
+		return "%s %s" % (name, TABLEB[a])
+	if op <= XOR:
+		return "%s %s %s %s" % (name, TABLEE[a], TABLEE[b], TABLEB[c])
+	if op <= ROTR:
+		return "%s %s %s" % (name, TABLEE[a], TABLEB[c])
+	if op == MOVE:
+		return "%s %s %s" % (name, TABLED[a], TABLEB[c])
+	if op == MOVEI:
+		return "%s %d %s" % (name, b, TABLEB[c])
+
+	return "invalid %s" % (format(word, '016b'))
+
+
+# returns the cycle cost of every word of a program, using a table of
+# cycles keyed by mnemonic
+def cyclecosts( words, cycles=CYCLES ):
+	costs = array.array( 'L' )
+	for word in words:
+		name = mnemonic( decode(word) )
+		costs.append( cycles.get( name, 0 ) )
+
+	return costs
+
+
+class Simulator:
+
+	# words is the program image; inputs are the values read by IPORT and
+	# data is the initial data memory image
+	def __init__( self, words, inputs=(), cycles=CYCLES, data=() ):
+		if len(words) > 256:
+			raise ValueError( 'program too large: %d words' % (len(words)) )
+		if len(data) > 256:
+			raise ValueError( 'data too large: %d words' % (len(data)) )
+
+		self.words = list( words ) + [ 0xFFFF ] * ( 256 - len(words) )
+		self.code = [ decode(word) for word in self.words ]
+		self.costs = cyclecosts( self.words, cycles )
+		self.inputs = list( inputs )
+		self.data = array.array( 'H', data ) + array.array( 'H', [0] * ( 256 - len(data) ) )
+		self.reset()
+
+	# puts the machine in its power on state
+	def reset( self ):
+		self.regs = array.array( 'H', [0] * 6 )
+		self.mem = array.array( 'H', self.data )
+		self.pc = 0
+		self.ir = 0
+		self.cr = 0
+		self.steps = 0
+		self.cycles = 0
+		self.inpos = 0
+		self.output = []
+		self.status = "ready"
+
+	# writes a snapshot of the machine into blob, a writable buffer of
+	# SNAPSHOT bytes, or into a new bytearray, and returns it
+	def snapshot( self, blob=None ):
+		if blob is None:
+			blob = bytearray( SNAPSHOT )
+
+		view = memoryview( blob )
+		HEADER.pack_into( view, 0, self.pc, self.cr, self.ir, STATUSES.index( self.status ),
+						  self.inpos, self.steps, self.cycles, len(self.output) )
+		view[REGISTERS:MEMORY] = memoryview( self.regs ).cast( 'B' )
+		view[MEMORY:SNAPSHOT] = memoryview( self.mem ).cast( 'B' )
+
+		return blob
+
+	# puts the machine in the state recorded by a snapshot; output values
+	# produced after the snapshot was taken are dropped
+	def restore( self, blob ):
+		view = memoryview( blob )
+		if len(view) != SNAPSHOT:
+			raise ValueError( 'snapshot must be %d bytes, not %d' % (SNAPSHOT, len(view)) )
+
+		( self.pc, self.cr, self.ir, status, self.inpos, self.steps,
+		  self.cycles, outlen ) = HEADER.unpack_from( view, 0 )
+		self.status = STATUSES[ status ]
+		memoryview( self.regs ).cast( 'B' )[:] = view[REGISTERS:MEMORY]
+		memoryview( self.mem ).cast( 'B' )[:] = view[MEMORY:SNAPSHOT]
+		del self.output[outlen:]
+
+	# writes a snapshot of the machine to a binary file
+	def save( self, fp ):
+		fp.write( self.snapshot() )
+
+	# reads a snapshot of the machine from a binary file
+	def load( self, fp ):
+		blob = bytearray( SNAPSHOT )
+		if fp.readinto( blob ) != SNAPSHOT:
+			raise ValueError( 'truncated snapshot' )
+		self.restore( blob )
+
+	# runs like run(), taking a snapshot every interval instructions, and
+	# returns the list of snapshots; all of them share one buffer
+	def checkpoints( self, interval, maxsteps=1000000 ):
+		count = max( 1, maxsteps // interval )
+		store = memoryview( bytearray( count * SNAPSHOT ) )
+		result = []
+
+		done = 0
+		while done < maxsteps and len(result) < count:
+			steps = self.steps
+			status = self.run( min( interval, maxsteps - done ) )
+			done += self.steps - steps
+			if status != "steps":
+				break
+			result.append( self.snapshot( store[ len(result) * SNAPSHOT : (len(result) + 1) * SNAPSHOT ] ) )
+
+		return result
+
+	# runs until HALT, an invalid instruction or maxsteps instructions,
+	# and returns the status: "halt", "invalid" or "steps"
+	#
+	# If a profiler.Profile is given, execution counts, taken branches
+	# and the stack high-water mark are recorded in it.  If a
+	# trace.Writer is given, each instruction is recorded in it with the
+	# registers and CR it leaves.
+	def run( self, maxsteps=1000000, profile=None, trace=None ):
+		code = self.code
+		words = self.words
+		costs = self.costs
+		regs = self.regs
+		mem = self.mem
+		inputs = self.inputs
+		output = self.output
+		pc = self.pc
+		ir = self.ir
+		cr = self.cr
+		inpos = self.inpos
+		cycles = self.cycles
+
+		if profile is not None:
+			counts = profile.counts
+			taken = profile.taken
+			sp0 = profile.sp0
+			if sp0 is None:
+				sp0 = profile.sp0 = regs[5]
+			maxdepth = profile.maxdepth
+
+		status = "steps"
+		n = 0
+		pending = False
+		while n < maxsteps:
+			if pending:
+				trace.record( last, ir, regs, cr )
+				pending = False
+
+			op, a, b, c = code[pc]
+			if op == INVALID:
+				status = "invalid"
+				break
+
+			if profile is not None:
+				counts[pc] += 1
+
+			ir = words[pc]
+			cycles += costs[pc]
+			n += 1
+			if trace is not None:
+				last = pc
+				pending = True
+			pc = (pc + 1) & 0xFF
+
+			if op >= ADD:
+				if op == MOVEI:
+					regs[c] = b & 0xFFFF
+					continue
+
+				if op == MOVE:
+					if a < 6:
+						regs[c] = regs[a]
+					elif a == 6:
+						regs[c] = pc
+					else:
+						regs[c] = ir
+					continue
+
+				x = regs[a] if a < 6 else ( 0 if a == 6 else 0xFFFF )
+				flags = 0
+
+				if op == ADD or op == SUB:
+					y = regs[b] if b < 6 else ( 0 if b == 6 else 0xFFFF )
+					if op == ADD:
+						r = x + y
+						if r > 0xFFFF:
+							flags |= 8
+						r &= 0xFFFF
+						if (x ^ r) & (y ^ r) & 0x8000:
+							flags |= 4
+					else:
+						r = x - y
+						if r < 0:
+							flags |= 8
+						r &= 0xFFFF
+						if (x ^ y) & (x ^ r) & 0x8000:
+							flags |= 4
+				elif op <= XOR:
+					y = regs[b] if b < 6 else ( 0 if b == 6 else 0xFFFF )
+					if op == AND:
+						r = x & y
+					elif op == OR:
+						r = x | y
+					else:
+						r = x ^ y
+				elif op == SHIFTL:
+					r = (x << 1) & 0xFFFF
+					if x & 0x8000:
+						flags |= 8
+				elif op == SHIFTR:
+					r = (x >> 1) | (x & 0x8000)
+					if x & 1:
+						flags |= 8
+				elif op == ROTL:
+					r = ((x << 1) | (x >> 15)) & 0xFFFF
+				else:
+					r = (x >> 1) | ((x & 1) << 15)
+
+				if r == 0:
+					flags |= 1
+				if r & 0x8000:
+					flags |= 2
+				regs[c] = r
+				cr = flags
+
+			elif op <= STOREA:
+				addr = b
+				if op == LOADA or op == STOREA:
+					addr = (b + regs[4]) & 0xFF
+				if op <= LOADA:
+					regs[a] = mem[addr]
+				else:
+					mem[addr] = regs[a]
+
+			elif op == BRA:
+				pc = b
+
+			elif op == BRC:
+				if (cr >> a) & 1:
+					if profile is not None:
+						taken[(pc - 1) & 0xFF] += 1
+					pc = b
+
+			elif op == CALL:
+				sp = regs[5]
+				mem[sp & 0xFF] = pc
+				mem[(sp + 1) & 0xFF] = cr
+				regs[5] = (sp + 2) & 0xFFFF
+				pc = b
+				if profile is not None and regs[5] - sp0 > maxdepth:
+					maxdepth = regs[5] - sp0
+
+			elif op == RETURN:
+				sp = regs[5]
+				cr = mem[(sp - 1) & 0xFF] & 0xF
+				pc = mem[(sp - 2) & 0xFF] & 0xFF
+				regs[5] = (sp - 2) & 0xFFFF
+
+			elif op == HALT:
+				status = "halt"
+				break
+
+			elif op == PUSH:
+				if a < 6:
+					v = regs[a]
+				elif a == 6:
+					v = pc
+				else:
+					v = cr
+				sp = regs[5]
+				mem[sp & 0xFF] = v
+				regs[5] = (sp + 1) & 0xFFFF
+				if profile is not None and regs[5] - sp0 > maxdepth:
+					maxdepth = regs[5] - sp0
+
+			elif op == POP:
+				sp = (regs[5] - 1) & 0xFFFF
+				regs[5] = sp
+				v = mem[sp & 0xFF]
+				if a < 6:
+					regs[a] = v
+				elif a == 6:
+					pc = v & 0xFF
+				else:
+					cr = v & 0xF
+
+			elif op == OPORT:
+				if a < 6:
+					output.append( regs[a] )
+				elif a == 6:
+					output.append( pc )
+				else:
+					output.append( ir )
+
+			else:
+				v = 0
+				if inpos < len(inputs):
+					v = inputs[inpos] & 0xFFFF
+					inpos += 1
+				regs[a] = v
+
+		if pending:
+			trace.record( last, ir, regs, cr )
+
+		if profile is not None:
+			profile.maxdepth = maxdepth
+
+		self.pc = pc
+		self.ir = ir
+		self.cr = cr
+		self.inpos = inpos
+		self.cycles = cycles
+		self.steps += n
+		self.status = status
+
+		return status
+
+
+def main( argv ):
+	if len(argv) < 2:
+		print('Usage: python %s <filename> [<input> ...]' % (argv[0]))
+		exit()
+
+	fp = open( argv[1], 'r' )
+	tokens = assembler.tokenize( fp )
+	fp.close()
+
+	labels = assembler.pass1( tokens )
+	words = assembler.towords( assembler.pass2( tokens, labels ) )
+	image, size = assembler.data( tokens, labels )
+
+	sim = Simulator( words, [ int(v) for v in argv[2:] ], data=image[:size] )
+	status = sim.run()
+
+	print('%s after %d instructions, %d cycles' % (status, sim.steps, sim.cycles))
+	print('output: %s' % (' '.join( str(v) for v in sim.output )))
+
+	return
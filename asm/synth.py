@@ -0,0 +1,107 @@
+# Instruction sequences for 16-bit constants
+#
+# MOVEI only loads an 8-bit signed immediate.  The pseudo-instruction
+#
+#	LI V C	 - execute C <= V, for any 16-bit value V
+#
+# is expanded by tokenize into the shortest sequence that builds V in C
+# alone: a MOVEI followed by single register steps
+#
+#	SHIFTL C C, SHIFTR C C, ROTL C C, ROTR C C
+#	ADD C ones C  (C - 1), SUB C ones C  (C + 1), XOR C ones C  (not C)
+#
+# No other register is touched, but CR is changed by every step after the
+# MOVEI.  OR and AND with C itself or the constants never give a shorter
+# sequence, so they are not searched.
+#
+# The shortest sequences for all 65536 values are found together by one
+# breadth-first search from the 256 MOVEI values, run the first time LI
+# is used; the expansion of each constant is then kept in sequences.
+#
+
+import array
+
+# ( mnemonic, uses the ones constant, step function )
+STEPS = [
+	( "shiftl", False, lambda x: (x << 1) & 0xFFFF ),
+	( "shiftr", False, lambda x: (x >> 1) | (x & 0x8000) ),
+	( "rotl",	False, lambda x: ((x << 1) | (x >> 15)) & 0xFFFF ),
+	( "rotr",	False, lambda x: (x >> 1) | ((x & 1) << 15) ),
+	( "add",	True,  lambda x: (x - 1) & 0xFFFF ),
+	( "sub",	True,  lambda x: (x + 1) & 0xFFFF ),
+	( "xor",	True,  lambda x: x ^ 0xFFFF ),
+]
+
+# search result: the step that reaches each value (-1 for a MOVEI value)
+# and the value it is applied to
+_step = None
+_prev = None
+
+# expansions already built, keyed by value: ( MOVEI value, list of step
+# indexes )
+sequences = {}
+
+
+# runs the breadth-first search over all values
+def search():
+	global _step, _prev
+
+	step = array.array( 'b', [-2] ) * 65536
+	prev = array.array( 'H', [0] ) * 65536
+
+	frontier = []
+	for v in range(-128, 128):
+		step[ v & 0xFFFF ] = -1
+		frontier.append( v & 0xFFFF )
+
+	while frontier:
+		following = []
+		for x in frontier:
+			for k in range(len(STEPS)):
+				y = STEPS[k][2]( x )
+				if step[y] == -2:
+					step[y] = k
+					prev[y] = x
+					following.append( y )
+		frontier = following
+
+	_step = step
+	_prev = prev
+
+
+# returns ( MOVEI value, step indexes ) of the shortest sequence that
+# builds a 16-bit value
+def shortest( value ):
+	if value in sequences:
+		return sequences[value]
+
+	if _step is None:
+		search()
+
+	found = []
+	x = value
+	while _step[x] >= 0:
+		found.append( _step[x] )
+		x = _prev[x]
+	found.reverse()
+
+	if x > 127:
+		x -= 65536
+
+	sequences[value] = ( x, found )
+	return sequences[value]
+
+
+# returns the instruction lines that load value into the register reg
+def expand( value, reg ):
+	start, found = shortest( value & 0xFFFF )
+
+	lines = [ [ "movei", start, reg ] ]
+	for k in found:
+		name, ones, f = STEPS[k]
+		if ones:
+			lines.append( [ name, reg, "ones", reg ] )
+		else:
+			lines.append( [ name, reg, reg ] )
+
+	return lines
@@ -0,0 +1,308 @@
+# Execution traces of the simulator in a compact binary format
+#
+# usage: python assembler.py trace <filename> <output.trace> [<input> ...]
+#		 python assembler.py trace -p <filename> <input.trace> [<count>]
+#
+# The first form runs the program and records every instruction executed;
+# the second prints a recorded trace with each address mapped back to its
+# label and source line.
+#
+# A trace file is MAGIC followed by the state before the first
+# instruction (PC, RA..SP and CR as varints) and then one record for each
+# instruction, holding the state it leaves:
+#
+#	flags	 - bits 0-5 set for each register of RA..SP that changed,
+#			   bit 6 if CR changed, bit 7 if the word is given
+#	pc		 - the address minus the address after the last instruction,
+#			   as a zigzag varint (0 unless the last one branched)
+#	word	 - the instruction word as a varint, only given the first time
+#			   an address is executed or if the word there changed
+#	deltas	 - the change of each changed register, as a signed 16-bit
+#			   zigzag varint
+#	cr		 - the new CR, one byte
+#
+# A straight-line instruction that writes one register typically takes 3
+# bytes, and one that writes none takes 2.
+#
+# Records are encoded into a buffer that is handed to a writer thread
+# once it holds limit bytes.  At most depth buffers wait for the thread,
+# so a long trace is written out as it is made and memory use stays
+# bounded.  If a write fails, the thread keeps taking buffers, so the
+# simulator never waits on it, and the error is raised again by the
+# next flush or by close.
+#
+
+import queue
+import threading
+
+from . import assembler
+from . import simulator
+from . import symbols
+
+MAGIC = b"ASMTRC1\n"
+
+# the longest record: flags, pc, word, six deltas and CR
+LONGEST = 1 + 2 + 3 + 6 * 3 + 1
+
+
+# appends v >= 0 to buf as a varint
+def varint( buf, v ):
+	while v > 0x7F:
+		buf.append( (v & 0x7F) | 0x80 )
+		v >>= 7
+	buf.append( v )
+
+
+# returns the zigzag code of a signed value
+def zigzag( v ):
+	if v < 0:
+		return (-v << 1) - 1
+	return v << 1
+
+
+# returns the signed value of a zigzag code
+def unzigzag( z ):
+	if z & 1:
+		return -( (z + 1) >> 1 )
+	return z >> 1
+
+
+# returns ( value, next position ) of the varint at pos in data
+def readvarint( data, pos ):
+	v = 0
+	shift = 0
+	while True:
+		byte = data[pos]
+		pos += 1
+		v |= (byte & 0x7F) << shift
+		if byte < 0x80:
+			return ( v, pos )
+		shift += 7
+
+
+class Writer:
+
+	# fp is a binary file; sim is the simulator about to run
+	def __init__( self, fp, sim, limit=1 << 16, depth=4 ):
+		self.fp = fp
+		self.limit = limit
+		self.queue = queue.Queue( depth )
+		self.error = None
+		self.thread = threading.Thread( target=self.drain )
+		self.thread.daemon = True
+		self.thread.start()
+
+		self.count = 0
+		self.size = 0
+		self.next = sim.pc
+		self.regs = list( sim.regs )
+		self.cr = sim.cr
+		self.known = [ -1 ] * 256
+
+		self.buf = bytearray( MAGIC )
+		varint( self.buf, sim.pc )
+		for v in self.regs:
+			varint( self.buf, v )
+		varint( self.buf, sim.cr )
+
+	# writes the buffers handed over until it gets None, keeping the first
+	# error and dropping the buffers after it
+	def drain( self ):
+		while True:
+			chunk = self.queue.get()
+			if chunk is None:
+				break
+			if self.error is None:
+				try:
+					self.fp.write( chunk )
+				except Exception as e:
+					self.error = e
+
+	# records the instruction at pc, its word and the registers and CR it
+	# left behind
+	def record( self, pc, word, regs, cr ):
+		buf = self.buf
+		at = len(buf)
+		buf.append( 0 )
+
+		flags = 0
+		d = (pc - self.next) & 0xFF
+		if d > 127:
+			d -= 256
+		varint( buf, zigzag( d ) )
+		self.next = (pc + 1) & 0xFF
+
+		if self.known[pc] != word:
+			self.known[pc] = word
+			flags |= 0x80
+			varint( buf, word )
+
+		old = self.regs
+		for i in range(6):
+			v = regs[i]
+			if v != old[i]:
+				flags |= 1 << i
+				d = (v - old[i]) & 0xFFFF
+				if d > 0x7FFF:
+					d -= 0x10000
+				varint( buf, zigzag( d ) )
+				old[i] = v
+
+		if cr != self.cr:
+			flags |= 0x40
+			buf.append( cr )
+			self.cr = cr
+
+		buf[at] = flags
+		self.count += 1
+
+		if len(buf) >= self.limit:
+			self.flush()
+
+	# hands the buffer to the writer thread, raising the error of an
+	# earlier write
+	def flush( self ):
+		if self.error is not None:
+			raise self.error
+		if self.buf:
+			self.size += len(self.buf)
+			self.queue.put( bytes( self.buf ) )
+			self.buf = bytearray()
+
+	# writes out the rest of the trace and stops the writer thread
+	def close( self ):
+		try:
+			self.flush()
+		finally:
+			self.queue.put( None )
+			self.thread.join()
+		if self.error is not None:
+			raise self.error
+		self.fp.flush()
+
+
+# reads a trace from the binary file fp and yields ( pc, word, regs, cr )
+# for each instruction, with the registers and CR it left behind
+def read( fp, chunksize=1 << 16 ):
+	data = fp.read( max( chunksize, 64 ) )
+	if not data.startswith( MAGIC ):
+		raise ValueError( 'not a trace file' )
+
+	pos = len(MAGIC)
+	pc, pos = readvarint( data, pos )
+	regs = [0] * 6
+	for i in range(6):
+		regs[i], pos = readvarint( data, pos )
+	cr, pos = readvarint( data, pos )
+	known = [ -1 ] * 256
+
+	done = False
+	while True:
+		# keep a whole record in hand until the end of the file
+		if not done and len(data) - pos < LONGEST:
+			more = fp.read( chunksize )
+			done = not more
+			data = data[pos:] + more
+			pos = 0
+		if pos >= len(data):
+			break
+
+		flags = data[pos]
+		d, pos = readvarint( data, pos + 1 )
+		pc = (pc + unzigzag( d )) & 0xFF
+
+		if flags & 0x80:
+			known[pc], pos = readvarint( data, pos )
+
+		for i in range(6):
+			if flags >> i & 1:
+				d, pos = readvarint( data, pos )
+				regs[i] = (regs[i] + unzigzag( d )) & 0xFFFF
+
+		if flags & 0x40:
+			cr = data[pos]
+			pos += 1
+
+		yield ( pc, known[pc], tuple( regs ), cr )
+		pc = (pc + 1) & 0xFF
+
+
+# maps addresses back to the labels and source lines of a program
+class Locator:
+
+	# labels is the label table from pass1; lines is the source line
+	# number of each address, from assembler.addresslines
+	def __init__( self, labels, lines=None ):
+		if not isinstance( labels, symbols.SymbolTable ):
+			labels = symbols.SymbolTable( labels )
+		self.labels = labels
+		self.lines = lines or []
+
+	# returns the address as label+offset from the nearest program label
+	# at or before it, or in hex if there is none
+	def name( self, addr ):
+		found = self.labels.nearest( addr )
+		if found is None:
+			return "%02X" % (addr)
+		if found[1] == 0:
+			return found[0]
+		return "%s+%d" % found
+
+	# returns the source line number of the address, or 0
+	def line( self, addr ):
+		if addr < len(self.lines):
+			return self.lines[addr]
+		return 0
+
+
+def main( argv ):
+	if len(argv) < 3 or ( argv[1] == "-p" and len(argv) < 4 ):
+		print('Usage: python %s <filename> <output.trace> [<input> ...]' % (argv[0]))
+		print('	   python %s -p <filename> <input.trace> [<count>]' % (argv[0]))
+		exit()
+
+	show = argv[1] == "-p"
+	if show:
+		argv = argv[1:]
+
+	fp = open( argv[1], 'r' )
+	linenums = []
+	tokens = assembler.tokenize( fp, linenums )
+	fp.close()
+
+	labels = assembler.pass1( tokens )
+	words = assembler.towords( assembler.pass2( tokens, labels ) )
+
+	if not show:
+		image, size = assembler.data( tokens, labels )
+		sim = simulator.Simulator( words, [ int(v) for v in argv[3:] ], data=image[:size] )
+
+		fp = open( argv[2], 'wb' )
+		writer = Writer( fp, sim )
+		status = sim.run( trace=writer )
+		writer.close()
+		fp.close()
+
+		print('%s after %d instructions, %d cycles' % (status, sim.steps, sim.cycles))
+		print('%d records, %d bytes' % (writer.count, writer.size))
+		return
+
+	locator = Locator( labels, assembler.addresslines( tokens, linenums ) )
+	count = -1
+	if len(argv) > 3:
+		count = int( argv[3] )
+
+	fp = open( argv[2], 'rb' )
+	try:
+		for n, ( pc, word, regs, cr ) in enumerate( read( fp ) ):
+			if n == count:
+				break
+			print('%8d  %02X %-12s %4d  %-20s %s  cr %X' % (n, pc, locator.name(pc), locator.line(pc),
+															 simulator.disassemble(word),
+															 ' '.join( "%04X" % (v) for v in regs ), cr))
+	except ( ValueError, IndexError ):
+		print('%s is not a trace file' % (argv[2]))
+		exit()
+	fp.close()
+
+	return
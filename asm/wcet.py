@@ -0,0 +1,266 @@
+# Worst-case execution time estimator
+#
+# usage: python assembler.py wcet <filename> [<label>=<bound> ...] [<cycles.json>]
+#
+# Computes an upper bound on the cycles each routine takes, from a table
+# of cycles per mnemonic (simulator.CYCLES unless a JSON file with the
+# same keys is given) and a bound for every loop.
+#
+# - A loop is found from a back edge of the control-flow graph; its bound
+# - is the largest number of times its header block runs for one entry
+# - to the loop, and is given by the label of the header (or its address
+# - in hex), e.g. loop=10 for fib.txt.
+#
+# - Loops are collapsed innermost first: a loop costs its bound times the
+# - longest path through its body, and then stands as a single node.  The
+# - WCET of a routine is the longest path through the remaining DAG.
+#
+# - A CALL adds the WCET of the routine called, so routines are costed
+# - callees first; recursive routines cannot be bounded.
+#
+# Block costs are computed once and shared by every routine.
+#
+
+import json
+
+from . import assembler
+from . import cfg
+from . import simulator
+
+
+class Unbounded( Exception ):
+	pass
+
+
+class Estimator:
+
+	# graph is a cfg.Graph, bounds maps loop header labels (or hex
+	# addresses) to iteration counts and cycles maps mnemonics to cycles
+	def __init__( self, graph, bounds=None, cycles=simulator.CYCLES ):
+		self.graph = graph
+		self.bounds = bounds or {}
+		self.costs = simulator.cyclecosts( graph.words, cycles )
+		self.blockcosts = {}
+		self.results = {}
+
+		# the labels at each address, in the order they were defined
+		self.names = {}
+		for label, addr in assembler.codelabels( graph.labels ):
+			self.names.setdefault( addr, [] ).append( label )
+
+	# returns the name of an address, its first label if it has one
+	def name( self, addr ):
+		if addr in self.names:
+			return self.names[addr][0]
+		return "%02X" % (addr)
+
+	# returns the cycles of block i, the routines it calls included
+	def blockcost( self, i ):
+		if i in self.blockcosts:
+			return self.blockcosts[i]
+
+		graph = self.graph
+		total = 0
+		for addr in range( graph.start[i], graph.end[i] ):
+			total += self.costs[addr]
+			op, a, b, c = graph.code[addr]
+			if op == simulator.CALL:
+				total += self.routine( b )
+
+		self.blockcosts[i] = total
+		return total
+
+	# returns the bound of the loop whose header block starts at addr
+	def bound( self, addr ):
+		for key in self.names.get( addr, [] ) + [ "%02X" % (addr), "%02x" % (addr) ]:
+			if key in self.bounds:
+				return int( self.bounds[key] )
+
+		raise Unbounded( 'loop at %s has no bound' % (self.name(addr)) )
+
+	# returns the WCET of the routine at entry
+	def routine( self, entry ):
+		if entry not in self.graph.body:
+			raise Unbounded( 'call to %02X outside the program' % (entry) )
+		if entry in self.results:
+			if self.results[entry] is None:
+				raise Unbounded( 'recursion through %s' % (self.name(entry)) )
+			return self.results[entry]
+
+		self.results[entry] = None
+		try:
+			self.results[entry] = self.longest( entry )
+		except Unbounded:
+			del self.results[entry]
+			raise
+
+		return self.results[entry]
+
+	# returns the loops of the routine at entry as ( size, header block,
+	# set of member blocks ), innermost first
+	def loops( self, entry ):
+		graph = self.graph
+		body = set( graph.body[entry] )
+		preds = dict( ( i, [] ) for i in body )
+		for i in body:
+			for j in graph.successors(i):
+				preds[j].append( i )
+
+		backedges = {}
+		onstack = set()
+		done = set()
+		first = graph.blockof[entry]
+		stack = [ ( first, 0 ) ]
+		onstack.add( first )
+		while stack:
+			i, k = stack.pop()
+			succ = graph.successors(i)
+			if k < len(succ):
+				stack.append( ( i, k + 1 ) )
+				j = succ[k]
+				if j in onstack:
+					backedges.setdefault( j, [] ).append( i )
+				elif j not in done:
+					onstack.add( j )
+					stack.append( ( j, 0 ) )
+				continue
+			onstack.discard( i )
+			done.add( i )
+
+		# the natural loop of a header: the blocks that reach a latch
+		# without passing through the header
+		loops = []
+		for header, latches in backedges.items():
+			members = set( [ header ] )
+			work = [ l for l in latches if l != header ]
+			members.update( work )
+			while work:
+				i = work.pop()
+				for p in preds[i]:
+					if p not in members:
+						members.add( p )
+						work.append( p )
+			loops.append( ( len(members), header, members ) )
+
+		loops.sort( key=lambda loop: loop[0] )
+		return loops
+
+	# returns the longest path, in cycles, through the routine at entry
+	def longest( self, entry ):
+		graph = self.graph
+		body = graph.body[entry]
+		cost = dict( ( i, self.blockcost(i) ) for i in body )
+		rep = dict( ( i, i ) for i in body )
+
+		def find( i ):
+			while rep[i] != i:
+				rep[i] = rep[ rep[i] ]
+				i = rep[i]
+			return i
+
+		for size, header, members in self.loops( entry ):
+			nodes = set( find(i) for i in members )
+			edges = {}
+			for i in members:
+				for j in graph.successors(i):
+					u = find(i)
+					v = find(j)
+					if v in nodes and v != header and u != v:
+						edges.setdefault( u, set() ).add( v )
+
+			iteration = self.dag( header, nodes, edges, cost )
+			cost[header] = self.bound( graph.start[header] ) * iteration
+			for i in members:
+				rep[ find(i) ] = header
+			rep[header] = header
+
+		nodes = set( find(i) for i in body )
+		edges = {}
+		for i in body:
+			for j in graph.successors(i):
+				u = find(i)
+				v = find(j)
+				if u != v:
+					edges.setdefault( u, set() ).add( v )
+
+		return self.dag( find( graph.blockof[entry] ), nodes, edges, cost )
+
+	# returns the longest path, node costs summed, from start to any node
+	# of an acyclic graph
+	def dag( self, start, nodes, edges, cost ):
+		indegree = dict( ( i, 0 ) for i in nodes )
+		for u in nodes:
+			for v in edges.get( u, () ):
+				indegree[v] += 1
+
+		# only the nodes reached from start count
+		dist = { start: cost[start] }
+		ready = [ i for i in nodes if indegree[i] == 0 ]
+		seen = 0
+		while ready:
+			u = ready.pop()
+			seen += 1
+			for v in edges.get( u, () ):
+				if u in dist:
+					d = dist[u] + cost[v]
+					if dist.get( v, -1 ) < d:
+						dist[v] = d
+				indegree[v] -= 1
+				if indegree[v] == 0:
+					ready.append( v )
+
+		if seen != len(nodes):
+			raise Unbounded( 'irreducible loop near %s' % (self.name( self.graph.start[start] )) )
+
+		return max( dist.values() )
+
+	# returns a dictionary from each routine entry to its WCET in cycles,
+	# or to the reason it cannot be bounded
+	def estimate( self ):
+		result = {}
+		for entry in self.graph.routines:
+			try:
+				result[entry] = self.routine( entry )
+			except Unbounded as e:
+				result[entry] = str( e )
+
+		return result
+
+
+def main( argv ):
+	if len(argv) < 2:
+		print('Usage: python %s <filename> [<label>=<bound> ...] [<cycles.json>]' % (argv[0]))
+		exit()
+
+	bounds = {}
+	cycles = simulator.CYCLES
+	for arg in argv[2:]:
+		if arg.endswith(".json"):
+			fp = open( arg, 'r' )
+			cycles = dict( simulator.CYCLES )
+			cycles.update( json.load( fp ) )
+			fp.close()
+		else:
+			label, bound = arg.split( "=" )
+			bounds[ label.lower() ] = int( bound )
+
+	fp = open( argv[1], 'r' )
+	tokens = assembler.tokenize( fp )
+	fp.close()
+
+	labels = assembler.pass1( tokens )
+	words = assembler.towords( assembler.pass2( tokens, labels ) )
+
+	estimator = Estimator( cfg.Graph( words, labels ), bounds, cycles )
+	failed = False
+	for entry, wcet in sorted( estimator.estimate().items() ):
+		if isinstance( wcet, str ):
+			failed = True
+			print('%-12s unbounded: %s' % (estimator.name(entry), wcet))
+		else:
+			print('%-12s %8d cycles' % (estimator.name(entry), wcet))
+
+	if failed:
+		exit(1)
+
+	return